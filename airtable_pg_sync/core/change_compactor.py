@@ -0,0 +1,167 @@
+import collections
+import functools
+import logging
+import operator
+
+from . import schema_cache
+from .types import changes, concepts, env_types
+
+
+def _table_id(change: changes.Change) -> concepts.TableId:
+    return change.table.id if isinstance(change, changes.NewTable) else change.table_id
+
+
+class Compactor:
+
+    def __init__(self, replication: env_types.Replication):
+        self.replication = replication
+        self.eliminated = 0
+        self._pg_tables: list[concepts.Table] = []
+        self._pg_fields: dict[tuple[concepts.TableId, concepts.FieldId], concepts.Field] = {}
+
+    @functools.cached_property
+    def logger(self) -> logging.Logger:
+        return logging.getLogger('Change Compactor')
+
+    def _refresh_pg_fields(self) -> None:
+        tables = list(schema_cache.SchemaCache.for_replication(self.replication).pg_tables().values())
+
+        # Cached tables are replaced rather than mutated, so the same table objects mean the same fields
+        if len(tables) == len(self._pg_tables) and all(map(operator.is_, tables, self._pg_tables)):
+            return
+
+        self._pg_tables = tables
+        self._pg_fields = {(table.id, field.id): field for table in tables for field in table.fields}
+
+    def compact(self, received_changes: list[changes.Change]) -> list[changes.Change]:
+        self._refresh_pg_fields()
+        out: list[changes.Change | None] = []
+        # Field types come from the Postgres schema as it was before the batch, so values are only folded into
+        # new rows while their table has not had a schema change within the batch
+        schema_changed: set[concepts.TableId] = set()
+        new_rows: dict[tuple[concepts.TableId, concepts.RowId], int] = {}
+        cells: dict[tuple[concepts.TableId, concepts.RowId, concepts.FieldId], int] = {}
+        cells_by_row: dict[tuple[concepts.TableId, concepts.RowId], set] = collections.defaultdict(set)
+        cells_by_field: dict[tuple[concepts.TableId, concepts.FieldId], set] = collections.defaultdict(set)
+        new_fields: dict[tuple[concepts.TableId, concepts.FieldId], int] = {}
+        field_changes: dict[tuple[concepts.TableId, concepts.FieldId], list[int]] = collections.defaultdict(list)
+        new_tables: dict[concepts.TableId, int] = {}
+        by_table: dict[concepts.TableId, list[int]] = collections.defaultdict(list)
+
+        def append(change: changes.Change) -> int:
+            out.append(change)
+            by_table[_table_id(change)].append(len(out) - 1)
+
+            return len(out) - 1
+
+        def drop_cell(key: tuple[concepts.TableId, concepts.RowId, concepts.FieldId]) -> None:
+            out[cells.pop(key)] = None
+            cells_by_row[key[:2]].discard(key)
+            cells_by_field[(key[0], key[2])].discard(key)
+
+        for change in received_changes:
+
+            if isinstance(change, changes.CellChange):
+                key = (change.table_id, change.row_id, change.field_id)
+
+                if key in cells:
+                    drop_cell(key)
+
+                new_row_index = new_rows.get(key[:2])
+                foldable = new_row_index is not None and change.table_id not in schema_changed
+                field = self._pg_fields.get((change.table_id, change.field_id)) if foldable else None
+
+                if field:
+                    row = out[new_row_index].row
+                    row.field_values = [
+                        *(value for value in row.field_values if value.field.id != change.field_id),
+                        concepts.FieldValue(field=field, value=change.value)
+                    ]
+                    continue
+
+                cells[key] = append(change)
+                cells_by_row[key[:2]].add(key)
+                cells_by_field[(key[0], key[2])].add(key)
+
+            elif isinstance(change, changes.NewRow):
+                new_row = changes.NewRow(
+                    table_id=change.table_id,
+                    row=concepts.Row(id=change.row.id, field_values=list(change.row.field_values))
+                )
+                new_rows[(change.table_id, change.row.id)] = append(new_row)
+
+            elif isinstance(change, changes.DestroyedRow):
+                key = (change.table_id, change.row_id)
+
+                for cell_key in list(cells_by_row.pop(key, ())):
+                    drop_cell(cell_key)
+
+                if key in new_rows:
+                    # Created and destroyed within the batch, so it never needs to reach Postgres
+                    out[new_rows.pop(key)] = None
+                    continue
+
+                append(change)
+
+            elif isinstance(change, changes.DestroyedField):
+                key = (change.table_id, change.field_id)
+                schema_changed.add(change.table_id)
+
+                for cell_key in list(cells_by_field.pop(key, ())):
+                    drop_cell(cell_key)
+
+                for (table_id, _), index in new_rows.items():
+
+                    if table_id == change.table_id:
+                        row = out[index].row
+                        row.field_values = [value for value in row.field_values if value.field.id != change.field_id]
+
+                for index in field_changes.pop(key, []):
+                    out[index] = None
+
+                if key in new_fields:
+                    out[new_fields.pop(key)] = None
+                    continue
+
+                append(change)
+
+            elif isinstance(change, changes.DestroyedTable):
+
+                for index in by_table.pop(change.table_id, []):
+                    out[index] = None
+
+                for state in (new_rows, cells, cells_by_row, cells_by_field, new_fields, field_changes):
+
+                    for key in [key for key in state if key[0] == change.table_id]:
+                        state.pop(key)
+
+                schema_changed.add(change.table_id)
+
+                if new_tables.pop(change.table_id, None) is not None:
+                    continue
+
+                append(change)
+
+            else:
+                schema_changed.add(_table_id(change))
+                index = append(change)
+
+                if isinstance(change, changes.NewField):
+                    new_fields[(change.table_id, change.field.id)] = index
+
+                elif isinstance(change, (changes.FieldTypeChange, changes.FieldNameChange)):
+                    field_changes[(change.table_id, change.field_id)].append(index)
+
+                elif isinstance(change, (changes.NewTable, changes.ImportedTable)):
+                    new_tables[_table_id(change)] = index
+
+        compacted = [change for change in out if change is not None]
+        self.eliminated += len(received_changes) - len(compacted)
+
+        if len(compacted) < len(received_changes):
+            self.logger.info(
+                f'Compacted {len(received_changes)} changes to {len(compacted)} '
+                f'({len(received_changes) - len(compacted)} eliminated)'
+            )
+
+        return compacted
@@ -1,85 +1,256 @@
+import contextlib
 import functools
+import itertools
 import logging
+import typing
 
-from .clients import postgres, airtable
-from .types import changes, env_types
-from ..initial_sync import table_syncer, individual_view_syncer, row_syncer
+from . import schema_cache
+from .clients import postgres
+from .types import changes, concepts, env_types
+from ..initial_sync import bulk_loader, table_syncer, individual_view_syncer, row_syncer
+
+
+ROW_CHANGES = (changes.CellChange, changes.NewRow, changes.DestroyedRow)
 
 
 class Handler:
 
     def __init__(self, replication: env_types.Replication):
         self.replication = replication
+        self.deferred_view_table_ids: set[concepts.TableId] | None = None
+        self.coalesced_view_syncs = 0
+        self.view_sync_requests = 0
 
     @functools.cached_property
     def logger(self) -> logging.Logger:
         return logging.getLogger('Change Handler')
 
+    @functools.cached_property
+    def schema_cache(self) -> schema_cache.SchemaCache:
+        return schema_cache.SchemaCache.for_replication(self.replication)
+
+    def defer_view_syncs(self) -> None:
+        if self.deferred_view_table_ids is None:
+            self.deferred_view_table_ids = set()
+
+    def sync_deferred_views(self) -> None:
+
+        if not self.deferred_view_table_ids:
+            return
+
+        table_ids, self.deferred_view_table_ids = self.deferred_view_table_ids, set()
+        self.logger.info(
+            f'Rebuilding {len(table_ids)} deferred views ({self.coalesced_view_syncs} rebuilds coalesced so far)'
+        )
+
+        for table_id in sorted(table_ids):
+
+            # The table may have been destroyed since its view was marked
+            if self.schema_cache.pg_table(table_id):
+                individual_view_syncer.IndividualViewSyncer(self.replication, table_id).sync()
+
+    @contextlib.contextmanager
+    def deferred_view_syncs(self) -> typing.Iterator[None]:
+        # Views marked during the block are rebuilt once each when it exits
+        already_deferring = self.deferred_view_table_ids is not None
+        self.defer_view_syncs()
+
+        try:
+            yield
+            self.sync_deferred_views()
+
+        finally:
+            # Also after a failure, so the handler goes back to syncing views straight away
+            if not already_deferring:
+                self.deferred_view_table_ids = None
+
+    def _sync_view(self, table_id: concepts.TableId) -> None:
+
+        if self.deferred_view_table_ids is None:
+            individual_view_syncer.IndividualViewSyncer(self.replication, table_id).sync()
+
+            return
+
+        self.view_sync_requests += 1
+
+        if table_id in self.deferred_view_table_ids:
+            self.coalesced_view_syncs += 1
+
+        else:
+            self.deferred_view_table_ids.add(table_id)
+
+    def _forget_sync_progress(self, table_id: concepts.TableId) -> None:
+        # Rows stored under the old schema cannot be built upon by an incremental or resumed sync
+        postgres.Client(self.replication.schema_name).clear_sync_watermark(table_id=table_id)
+        postgres.Client(self.replication.schema_name).clear_sync_checkpoint(table_id=table_id)
+
     @functools.singledispatchmethod
     def handle_change(self, change):
         raise NotImplementedError(f'Unknown change type type: {type(change)}')
 
+    def handle_changes(self, received_changes: list[changes.Change]) -> None:
+
+        for is_row_change, group in itertools.groupby(
+                received_changes,
+                key=lambda change: isinstance(change, ROW_CHANGES)
+        ):
+
+            if not is_row_change:
+
+                for change in group:
+                    self.handle_change(change)
+
+                continue
+
+            # Row changes need no results back, so they can be pipelined
+            with postgres.Client.pipeline():
+                pending_cell_changes: list[changes.CellChange] = []
+                # Rows with pending cell changes, so each row change is checked against them in constant time
+                pending_rows: set[tuple[concepts.TableId, concepts.RowId]] = set()
+
+                for change in group:
+
+                    if isinstance(change, changes.CellChange):
+                        pending_cell_changes.append(change)
+                        pending_rows.add((change.table_id, change.row_id))
+                        continue
+
+                    row_id = change.row.id if isinstance(change, changes.NewRow) else change.row_id
+
+                    if (change.table_id, row_id) in pending_rows:
+                        self._handle_cell_changes(pending_cell_changes)
+                        pending_cell_changes = []
+                        pending_rows = set()
+
+                    self.handle_change(change)
+
+                self._handle_cell_changes(pending_cell_changes)
+
+    def _get_timestamp_fields(self, table_ids: set[concepts.TableId]) -> set[tuple[concepts.TableId, concepts.FieldId]]:
+        timestamp_fields = set()
+
+        for table_id in table_ids:
+            table = self.schema_cache.pg_table(table_id)
+
+            if table:
+                timestamp_fields.update((table_id, field.id) for field in table.fields if field.type == 'TIMESTAMP')
+
+        return timestamp_fields
+
+    @staticmethod
+    def _parse_cell_value(
+            change: changes.CellChange,
+            timestamp_fields: set[tuple[concepts.TableId, concepts.FieldId]]
+    ) -> typing.Any:
+        # Webhook payloads carry raw values, timestamps are stored the same way as during the initial sync
+        if change.value is not None and (change.table_id, change.field_id) in timestamp_fields:
+            return concepts.parse_timestamp(change.value)
+
+        return change.value
+
+    def _handle_cell_changes(self, cell_changes: list[changes.CellChange]) -> None:
+        values_by_row: dict[tuple[concepts.TableId, concepts.RowId], dict[concepts.FieldId, typing.Any]] = {}
+        timestamp_fields = self._get_timestamp_fields({change.table_id for change in cell_changes})
+
+        for change in cell_changes:
+            values_by_row.setdefault((change.table_id, change.row_id), {})[change.field_id] = self._parse_cell_value(
+                change,
+                timestamp_fields
+            )
+
+        # One UPDATE per table and set of changed columns, covering every row with that column set
+        updates: dict[tuple[concepts.TableId, tuple[concepts.FieldId, ...]], list] = {}
+
+        for (table_id, row_id), values in values_by_row.items():
+            field_ids = tuple(sorted(values))
+            updates.setdefault((table_id, field_ids), []).append((row_id, [values[field_id] for field_id in field_ids]))
+
+        for (table_id, field_ids), rows in updates.items():
+            self.logger.info(f'Updating {len(field_ids)} columns in {len(rows)} rows in table {table_id}')
+            postgres.Client(self.replication.schema_name).update_rows(
+                table_id=table_id,
+                field_ids=list(field_ids),
+                rows=rows
+            )
+
     @handle_change.register
     def _handle_new_table(self, change: changes.NewTable):
         self.logger.info(f'Creating new table {change.table.id}')
         postgres.Client(self.replication.schema_name).create_table(table=change.table)
-        individual_view_syncer.IndividualViewSyncer(self.replication, change.table.id).sync()
-
+        self.schema_cache.apply(change)
+        self._sync_view(change.table.id)
 
     @handle_change.register
     def _handle_imported_table(self, change: changes.ImportedTable):
         self.logger.info(f'Importing table {change.table_id}')
-        airtable_table = next(
-            (table for table in airtable.Client(self.replication.base_id).get_schema()
-                if table.id == change.table_id),
-            None
-        )
+        airtable_table = self.schema_cache.airtable_table(change.table_id)
 
         try:
-            postgres.Client(self.replication.schema_name).create_table(table=airtable_table)
+            with postgres.Client.transaction():
+                postgres.Client(self.replication.schema_name).create_table(table=airtable_table)
 
         except Exception as e:
             self.logger.warning(f'Failed to create table')
             self.logger.warning(e)
 
-        row_syncer.RowSyncer(replication=self.replication, table=airtable_table).sync()
-        individual_view_syncer.IndividualViewSyncer(self.replication, change.table_id).sync()
+        self.schema_cache.apply(change)
+
+        if postgres.Client(self.replication.schema_name).is_table_empty(table_id=airtable_table.id):
+            bulk_loader.BulkLoader(replication=self.replication, table=airtable_table).sync()
+
+        else:
+            row_syncer.RowSyncer(replication=self.replication, table=airtable_table).sync()
+
+        self._sync_view(change.table_id)
 
     @handle_change.register
     def _handle_destroyed_table(self, change: changes.DestroyedTable):
         self.logger.info(f'Handling destroyed table {change.table_id}')
         postgres.Client(self.replication.schema_name).drop_table(table_id=change.table_id)
+        self._forget_sync_progress(change.table_id)
+        self.schema_cache.apply(change)
+
+        if self.deferred_view_table_ids:
+            self.deferred_view_table_ids.discard(change.table_id)
 
     @handle_change.register
     def _handle_table_name_change(self, change: changes.TableNameChange):
         self.logger.info(
             f'Updating name of table {change.table_id} to {change.table_name}'
         )
-        individual_view_syncer.IndividualViewSyncer(self.replication, change.table_id).sync()
+        self.schema_cache.apply(change)
+        self._sync_view(change.table_id)
 
     @handle_change.register
     def _handle_new_field(self, change: changes.NewField):
         self.logger.info(f'Creating new field {change.field.id} in table {change.table_id}')
         postgres.Client(self.replication.schema_name).create_field(table_id=change.table_id, field=change.field)
-        individual_view_syncer.IndividualViewSyncer(self.replication, change.table_id).sync()
+        # Existing rows have to be read in full once to fill the new column
+        self._forget_sync_progress(change.table_id)
+        self.schema_cache.apply(change)
+        self._sync_view(change.table_id)
 
     @handle_change.register
     def _handle_destroyed_field(self, change: changes.DestroyedField):
         self.logger.info(f'Destroying field {change.field_id} in table {change.table_id}')
         postgres.Client(self.replication.schema_name).drop_field(table_id=change.table_id, field_id=change.field_id)
-        individual_view_syncer.IndividualViewSyncer(self.replication, change.table_id).sync()
+        self.schema_cache.apply(change)
+        self._sync_view(change.table_id)
 
     @handle_change.register
     def _handle_field_type_change(self, change: changes.FieldTypeChange):
         self.logger.info(f'Changing field type of {change.field_id} to {change.field_type} in table {change.table_id}')
         individual_view_syncer.IndividualViewSyncer(self.replication, change.table_id).drop_view()
+        self._forget_sync_progress(change.table_id)
+        self.schema_cache.apply(change)
 
         try:
-            postgres.Client(self.replication.schema_name).change_field_type(
-                table_id=change.table_id,
-                field_id=change.field_id,
-                new_type=change.field_type
-            )
+            with postgres.Client.transaction():
+                postgres.Client(self.replication.schema_name).change_field_type(
+                    table_id=change.table_id,
+                    field_id=change.field_id,
+                    new_type=change.field_type
+                )
 
         except Exception as e:
             self.logger.error(e)
@@ -87,26 +258,22 @@ class Handler:
                 f'Failed to change field type of {change.field_id} to {change.field_type} in table {change.table_id}')
             self.logger.error('Dropping column and re-syncing table')
             postgres.Client(self.replication.schema_name).drop_field(table_id=change.table_id, field_id=change.field_id)
+            self.schema_cache.invalidate_pg()
             table_syncer.TableSyncer(
                 replication=self.replication,
-                airtable_table=next((
-                    table for table in airtable.Client(self.replication.base_id).get_schema()
-                    if table.id == change.table_id
-                )),
-                pg_table=next((
-                    table for table in postgres.Client(self.replication.schema_name).get_schema()
-                    if table.id == change.table_id
-                ))
+                airtable_table=self.schema_cache.airtable_table(change.table_id),
+                pg_table=self.schema_cache.pg_table(change.table_id)
             ).sync()
 
-        individual_view_syncer.IndividualViewSyncer(self.replication, change.table_id).sync()
+        self._sync_view(change.table_id)
 
     @handle_change.register
     def _handle_field_name_change(self, change: changes.FieldNameChange):
         self.logger.info(
             f'Updating name of column {change.field_id} in table {change.table_id} to {change.field_name}'
         )
-        individual_view_syncer.IndividualViewSyncer(self.replication, change.table_id).sync()
+        self.schema_cache.apply(change)
+        self._sync_view(change.table_id)
 
     @handle_change.register
     def _handle_destroyed_row_change(self, change: changes.DestroyedRow):
@@ -128,5 +295,5 @@ class Handler:
             table_id=change.table_id,
             row_id=change.row_id,
             field_id=change.field_id,
-            value=change.value
+            value=self._parse_cell_value(change, self._get_timestamp_fields({change.table_id}))
         )
@@ -1,18 +1,33 @@
+import collections
+import email.utils
 import functools
 import json
 import logging
+import random
+import threading
+import time
 import typing
 
 import requests
 
-from .. import env
-from ..clients import response_parser
+from .. import env, prefetcher
+from ..clients import rate_limiter, response_parser
 from ..types import changes, concepts, env_types
 
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {'GET', 'DELETE'}
+# Airtable blocks a base for 30 seconds after it has been sent too many requests
+RATE_LIMIT_PENALTY_SECONDS = 30
+MAX_BACKOFF_SECONDS = 30
+
 
 class Client:
     __session = None
+    __session_lock = threading.Lock()
+    __stats_lock = threading.Lock()
     API_URL = 'https://api.airtable.com/v0'
+    retries: collections.Counter = collections.Counter()
+    backoff_time: dict[str, float] = collections.defaultdict(float)
 
     def __init__(self, base_id: str):
         self.pat = env.value.airtable_pat
@@ -24,26 +39,119 @@ class Client:
 
     @classmethod
     def session(cls):
-        if not cls.__session:
-            cls.__session = requests.session()
+        with cls.__session_lock:
+
+            if not cls.__session:
+                cls.__session = requests.session()
+                # Tables and replications can be synced concurrently, so keep enough connections around to reuse
+                adapter = requests.adapters.HTTPAdapter(pool_maxsize=max(
+                    10,
+                    env.value.table_sync_concurrency * env.value.replication_sync_concurrency
+                ))
+                cls.__session.mount('https://', adapter)
 
         return cls.__session
 
-    def _fetch(self, url_extension: str, params: dict = None) -> requests.Response:
-        self.logger.debug(f'Fetching {url_extension} with params {params}')
+    @staticmethod
+    def _get_retry_after(response: requests.Response) -> float | None:
+        retry_after = response.headers.get('Retry-After')
+
+        if retry_after is None:
+            return None
+
         try:
-            response = self.session().get(
-                url=f'{self.API_URL}/{url_extension}',
-                headers={'Authorization': f'Bearer {self.pat}'},
-                params=params
-            )
-            self.logger.debug(f'Got response with code: {response.status_code}')
+            return max(0.0, float(retry_after))
+
+        except ValueError:
+            pass
+
+        try:
+            retry_at = email.utils.parsedate_to_datetime(retry_after)
+
+        except (TypeError, ValueError):
+            # A malformed header falls back to the usual backoff
+            return None
+
+        return max(0.0, retry_at.timestamp() - time.time())
+
+    def _get_backoff(self, response: requests.Response | None, attempt: int) -> float:
+
+        if response is not None:
+            retry_after = self._get_retry_after(response)
+
+            if retry_after is not None:
+                return retry_after
+
+            if response.status_code == 429:
+                return RATE_LIMIT_PENALTY_SECONDS
+
+        # Exponential backoff with jitter so that concurrent callers do not retry in lockstep
+        backoff = min(MAX_BACKOFF_SECONDS, 0.5 * 2 ** attempt)
+
+        return backoff / 2 + random.uniform(0, backoff / 2)
+
+    def _record_retry(self, backoff: float) -> None:
+        with self.__stats_lock:
+            self.retries[self.base] += 1
+            self.backoff_time[self.base] += backoff
+
+    def _request(self, method: str, url_extension: str, headers: dict = None, **kwargs) -> requests.Response:
+        limiter = rate_limiter.RateLimiter.for_base(self.base)
+        deadline = time.monotonic() + env.value.airtable_request_deadline_seconds
+        attempt = 0
+
+        while True:
+            waited = limiter.acquire()
+
+            if waited:
+                self.logger.debug(f'Waited {waited:.2f}s for the rate limit of base {self.base}')
+
+            response, error = None, None
+
+            try:
+                response = self.session().request(
+                    method=method,
+                    url=f'{self.API_URL}/{url_extension}',
+                    headers={'Authorization': f'Bearer {self.pat}', **(headers or {})},
+                    timeout=max(1.0, deadline - time.monotonic()),
+                    **kwargs
+                )
+                self.logger.debug(f'Got response with code: {response.status_code}')
+
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+
+            if response is not None and response.status_code not in RETRY_STATUS_CODES:
+                return response
+
+            # Only a 429 guarantees the request was not processed, so anything else is only retried when idempotent
+            retryable = method in IDEMPOTENT_METHODS or (response is not None and response.status_code == 429)
+            backoff = self._get_backoff(response, attempt)
+
+            if not retryable or time.monotonic() + backoff > deadline:
+                self.logger.error(f'Giving up on {method} {url_extension} after {attempt + 1} attempts')
 
-            return response
+                if error:
+                    self.logger.exception(error)
+                    raise error
 
-        except Exception as e:
-            self.logger.exception(e)
-            raise e
+                response.raise_for_status()
+
+            reason = f'status code {response.status_code}' if response is not None else repr(error)
+            self.logger.warning(f'Got {reason} from Airtable. Retrying {method} {url_extension} in {backoff:.1f}s')
+            self._record_retry(backoff)
+
+            if response is not None and response.status_code == 429:
+                # The whole base is throttled, so hold back every other request to it as well
+                limiter.pause(backoff)
+
+            time.sleep(backoff)
+            attempt += 1
+
+    def _fetch(self, url_extension: str, params: dict = None) -> requests.Response:
+        self.logger.debug(f'Fetching {url_extension} with params {params}')
+
+        return self._request('GET', url_extension, params=params)
 
     def get_schema(self) -> list[concepts.Table]:
         self.logger.debug('Getting schema')
@@ -54,46 +162,79 @@ class Client:
     def _get_row_chunk(
             self,
             table: concepts.Table,
-            offset: str = None
-    ) -> tuple[typing.Optional[str], list[concepts.Row]]:
+            offset: str = None,
+            formula: str = None
+    ) -> tuple[typing.Optional[str], concepts.RowBatch]:
         self.logger.debug(f'Getting row chunk for table {table.id} with offset {offset}')
-        response = self._fetch(f'{self.base}/{table.id}', params={'offset': offset or '', 'pageSize': 100})
+        params = {'offset': offset or '', 'pageSize': 100}
+
+        if formula:
+            params['filterByFormula'] = formula
+
+        response = self._fetch(f'{self.base}/{table.id}', params=params)
+        # e.g. a resumed offset that Airtable no longer recognises
+        response.raise_for_status()
 
         return response.json().get('offset'), response_parser.ResponseParser().parse_list_of_rows(table,
                                                                                                   response.json())
 
-    def get_rows(self, table: concepts.Table) -> typing.Generator[concepts.Row, None, None]:
-        self.logger.debug(f'Getting rows for table {table.id}')
-        offset = None
+    def _iter_pages(
+            self,
+            table: concepts.Table,
+            offset: concepts.PageOffset | None,
+            formula: str | None
+    ) -> typing.Generator[tuple[concepts.RowBatch, concepts.PageOffset | None], None, None]:
+        # Each page comes with the offset of the page after it, None after the last page
         first_loop = True
 
         while offset or first_loop:
+            first_loop = False
+            offset, chunk = self._get_row_chunk(table, offset, formula)
 
-            if first_loop:
-                first_loop = False
+            yield chunk, offset
 
-            offset, chunk = self._get_row_chunk(table, offset)
+    def get_pages(
+            self,
+            table: concepts.Table,
+            offset: concepts.PageOffset = None,
+            formula: str = None,
+            prefetch_depth: int = 0
+    ) -> typing.Iterable[tuple[concepts.RowBatch, concepts.PageOffset | None]]:
+        # With a prefetch depth the next pages are fetched on a background thread while the caller works on this one
+        return prefetcher.Prefetcher(
+            self._iter_pages(table, offset, formula),
+            depth=prefetch_depth,
+            name=f'prefetch_{table.id}'
+        )
 
-            for row in chunk:
-                yield row
+    def get_row_batches(
+            self,
+            table: concepts.Table,
+            formula: str = None,
+            prefetch_depth: int = 0
+    ) -> typing.Generator[concepts.RowBatch, None, None]:
+        self.logger.debug(f'Getting rows for table {table.id}')
 
-    def get_matching_ids(self, table: concepts.Table, row_ids: list[concepts.RowId]) -> list[concepts.RowId]:
-        self.logger.debug(f'Getting rows with ids {row_ids}')
+        for batch, _ in self.get_pages(table, formula=formula, prefetch_depth=prefetch_depth):
+            yield batch
 
-        if len(row_ids) > 100:
-            raise ValueError('get_rows_with_matching_ids only works for 100 or fewer ids')
+    def get_row_ids(self, table: concepts.Table) -> typing.Generator[concepts.RowId, None, None]:
+        self.logger.debug(f'Getting row ids for table {table.id}')
+        offset = None
+        first_loop = True
 
-        formula_list = ', '.join([f'RECORD_ID() = \'{row_id}\'' for row_id in row_ids])
-        response = self._fetch(
-            f'{self.base}/{table.id}',
-            params={
-                'filterByFormula': f'OR({formula_list})',
-                'fields': [table.fields[0].id, table.fields[0].id]
-            }
-        )
-        rows = response_parser.ResponseParser().parse_list_of_rows(table, response.json())
+        while offset or first_loop:
+            first_loop = False
+            # Only the primary field is requested so that pages stay small, the record ids come back regardless
+            response = self._fetch(
+                f'{self.base}/{table.id}',
+                params={'offset': offset or '', 'pageSize': 100, 'fields[]': [table.fields[0].id]}
+            )
+            response.raise_for_status()
+            offset = response.json().get('offset')
 
-        return [row.id for row in rows]
+            for record in response.json()['records']:
+                yield record['id']
 
     def list_webhooks(self) -> list[tuple[concepts.WebhookId, concepts.WebhookUrl]]:
         self.logger.debug('Listing webhooks')
@@ -105,15 +246,13 @@ class Client:
         return [(x['id'], x['notificationUrl']) for x in response.json()['webhooks']]
 
     def delete_webhook(self, webhook_id: concepts.WebhookId):
-        self.session().delete(
-            url=f'{self.API_URL}/bases/{self.base}/webhooks/{webhook_id}',
-            headers={'Authorization': f'Bearer {self.pat}'}
-        )
+        self._request('DELETE', f'bases/{self.base}/webhooks/{webhook_id}')
 
     def setup_webhook(self, replication: env_types.Replication) -> concepts.WebhookId:
-        response = self.session().post(
-            url=f'{self.API_URL}/bases/{self.base}/webhooks',
-            headers={'Authorization': f'Bearer {self.pat}', 'Content-Type': 'application/json'},
+        response = self._request(
+            'POST',
+            f'bases/{self.base}/webhooks',
+            headers={'Content-Type': 'application/json'},
             data=json.dumps({
                 'notificationUrl': f'{env.value.webhook_url}{replication.endpoint}',
                 'specification': {
@@ -153,8 +292,5 @@ class Client:
         return _changes, response['cursor']
 
     def refresh_webhook(self, webhook_id: concepts.WebhookId):
-        response = self.session().post(
-            url=f'{self.API_URL}/bases/{self.base}/webhooks/{webhook_id}/refresh',
-            headers={'Authorization': f'Bearer {self.pat}'}
-        )
+        response = self._request('POST', f'bases/{self.base}/webhooks/{webhook_id}/refresh')
         response.raise_for_status()
@@ -1,17 +1,34 @@
+import contextlib
+import datetime
 import functools
+import json
 import logging
+import re
+import threading
 import typing
 
 import psycopg
+import psycopg_pool
 from psycopg import sql
 
-from .. import env
+from .. import env, row_hasher
 from ..types import concepts
 
+# Tables the sync keeps for itself next to the replicated tables
+BOOKKEEPING_TABLES = ('table_names', 'webhook_state', 'sync_state', 'sync_checkpoints')
+
+# Digest of a row's values as last written from Airtable, NULL when a partial write made it unknown
+ROW_HASH_COLUMN = '_row_hash'
+
+# Matches the source column of each aliased select-list entry in pg_get_viewdef output. Before Postgres 16 the column
+# is qualified with the table it comes from
+VIEW_FIELD_PATTERN = re.compile(r'^\s+(?:"?[^".\s]+"?\.)?"?(fld[A-Za-z0-9]+)"? AS ', re.MULTILINE)
+
 
 class Client:
-    __connection = None
-    __cursor = None
+    __pool = None
+    __pool_lock = threading.Lock()
+    __local = threading.local()
 
     def __init__(self, schema: str):
         self.schema = schema
@@ -20,20 +37,104 @@ class Client:
     def logger(self) -> logging.Logger:
         return logging.getLogger('Postgres Client')
 
+    @staticmethod
+    def _log_reconnect_failure(pool: psycopg_pool.ConnectionPool) -> None:
+        logging.getLogger('Postgres Client').error(f'Could not reconnect to Postgres (pool: {pool.name})')
+
+    @classmethod
+    def pool(cls) -> psycopg_pool.ConnectionPool:
+        with cls.__pool_lock:
+
+            if cls.__pool is None or cls.__pool.closed:
+                cls.__pool = psycopg_pool.ConnectionPool(
+                    conninfo=env.value.connection_info,
+                    min_size=env.value.db_pool_min_size,
+                    max_size=env.value.db_pool_max_size,
+                    kwargs={'autocommit': True},
+                    check=psycopg_pool.ConnectionPool.check_connection,
+                    reconnect_failed=cls._log_reconnect_failure,
+                    name='airtable_pg_sync',
+                    open=True
+                )
+
+        return cls.__pool
+
     @classmethod
-    def connection(self) -> psycopg.Connection:
-        if self.__connection is None or self.__connection.closed:
-            self.__connection = psycopg.connect(conninfo=env.value.connection_info, autocommit=True)
+    @contextlib.contextmanager
+    def connection(cls) -> typing.Iterator[psycopg.Connection]:
+        pinned = getattr(cls.__local, 'connection', None)
 
-        return self.__connection
+        if pinned is not None:
+            yield pinned
 
-    def _run_query(self, query: sql.Composed, fetch: bool = False) -> list[typing.Tuple] | None:
-        self.logger.debug(f'Running query:\n{query.as_string(context=self.connection())}')
+            return
+
+        with cls.pool().connection() as connection:
+            yield connection
+
+    @classmethod
+    @contextlib.contextmanager
+    def pinned_connection(cls) -> typing.Iterator[psycopg.Connection]:
+        # Every query made on this thread inside the block goes through the same connection
+        if getattr(cls.__local, 'connection', None) is not None:
+            yield cls.__local.connection
+
+            return
+
+        with cls.pool().connection() as connection:
+            cls.__local.connection = connection
+
+            try:
+                yield connection
+
+            finally:
+                cls.__local.connection = None
+
+    @classmethod
+    @contextlib.contextmanager
+    def transaction(cls) -> typing.Iterator[psycopg.Connection]:
+        # Nested blocks become savepoints of the outer transaction
+        with cls.pinned_connection() as connection, connection.transaction():
+            yield connection
+
+    @classmethod
+    @contextlib.contextmanager
+    def pipeline(cls) -> typing.Iterator[psycopg.Connection]:
+        # Statements are sent without waiting for each result; only use for queries whose results are not needed
+        with cls.pinned_connection() as connection, connection.pipeline():
+            yield connection
+
+    @property
+    def _is_pinned(self) -> bool:
+        return getattr(self.__local, 'connection', None) is not None
+
+    def _execute(self, query: sql.Composed, result: typing.Callable[[psycopg.Cursor], typing.Any]) -> typing.Any:
+        attempts = 1 if self._is_pinned else 2
+
+        for attempt in range(1, attempts + 1):
+            connection = None
+
+            try:
+                with self.connection() as connection:
+                    self.logger.debug(f'Running query:\n{query.as_string(context=connection)}')
+
+                    with connection.cursor() as cursor:
+                        cursor.execute(query)
+
+                        return result(cursor)
+
+            except psycopg.OperationalError as e:
+                # The pool discards broken connections, so a retry gets a fresh one
+                if attempt == attempts or connection is None or not connection.closed:
+                    raise e
 
-        with self.connection().cursor() as cursor:
-            cursor.execute(query)
+                self.logger.warning(f'Lost connection to Postgres ({e}) - retrying with a new connection')
 
-            return cursor.fetchall() if fetch else None
+    def _run_query(self, query: sql.Composed, fetch: bool = False) -> list[typing.Tuple] | None:
+        return self._execute(query, lambda cursor: cursor.fetchall() if fetch else None)
+
+    def _run_command(self, query: sql.Composed) -> int:
+        return self._execute(query, lambda cursor: cursor.rowcount)
 
     def create_schema_is_not_exists(self) -> None:
         self.logger.debug('Creating schema if it doesnt exist')
@@ -51,6 +152,191 @@ class Client:
             ''').format(schema=sql.Identifier(self.schema))
         )
 
+    def create_webhook_state_table_if_not_exists(self) -> None:
+        self.logger.debug('Creating webhook_state table if it doesnt exist')
+        self._run_query(
+            sql.SQL('''
+                CREATE TABLE IF NOT EXISTS {schema}.webhook_state (
+                    base_id VARCHAR(17) PRIMARY KEY,
+                    webhook_id VARCHAR(255) NOT NULL,
+                    cursor TEXT,
+                    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                )
+            ''').format(schema=sql.Identifier(self.schema))
+        )
+
+    def get_webhook_state(
+            self,
+            base_id: str
+    ) -> tuple[concepts.WebhookId, concepts.WebhookCursor | None, datetime.datetime] | None:
+        rows = self._run_query(
+            sql.SQL('SELECT webhook_id, cursor, updated_at FROM {schema}.webhook_state WHERE base_id = {base_id}').format(
+                schema=sql.Identifier(self.schema),
+                base_id=sql.Literal(base_id)
+            ),
+            fetch=True
+        )
+
+        return rows[0] if rows else None
+
+    def save_webhook_state(
+            self,
+            base_id: str,
+            webhook_id: concepts.WebhookId,
+            cursor: concepts.WebhookCursor | None
+    ) -> None:
+        self.logger.debug(f'Saving webhook {webhook_id} with cursor {cursor} for base {base_id}')
+        self._run_query(
+            sql.SQL(
+                '''
+                INSERT INTO {schema}.webhook_state (base_id, webhook_id, cursor, updated_at)
+                VALUES ({base_id}, {webhook_id}, {cursor}, now())
+                ON CONFLICT (base_id) DO UPDATE SET webhook_id = {webhook_id}, cursor = {cursor}, updated_at = now()
+                '''
+            ).format(
+                schema=sql.Identifier(self.schema),
+                base_id=sql.Literal(base_id),
+                webhook_id=sql.Literal(webhook_id),
+                cursor=sql.Literal(None if cursor is None else str(cursor))
+            ),
+            fetch=False
+        )
+
+    def save_webhook_cursor(self, base_id: str, cursor: concepts.WebhookCursor) -> None:
+        self.logger.debug(f'Saving webhook cursor {cursor} for base {base_id}')
+        self._run_query(
+            sql.SQL(
+                'UPDATE {schema}.webhook_state SET cursor = {cursor}, updated_at = now() WHERE base_id = {base_id}'
+            ).format(
+                schema=sql.Identifier(self.schema),
+                base_id=sql.Literal(base_id),
+                cursor=sql.Literal(str(cursor))
+            ),
+            fetch=False
+        )
+
+    def create_sync_state_table_if_not_exists(self) -> None:
+        self.logger.debug('Creating sync_state table if it doesnt exist')
+        self._run_query(
+            sql.SQL('''
+                CREATE TABLE IF NOT EXISTS {schema}.sync_state (
+                    table_id VARCHAR(17) PRIMARY KEY,
+                    synced_until TIMESTAMPTZ NOT NULL
+                )
+            ''').format(schema=sql.Identifier(self.schema))
+        )
+
+    def get_sync_watermark(self, table_id: concepts.TableId) -> datetime.datetime | None:
+        rows = self._run_query(
+            sql.SQL('SELECT synced_until FROM {schema}.sync_state WHERE table_id = {table_id}').format(
+                schema=sql.Identifier(self.schema),
+                table_id=sql.Literal(table_id)
+            ),
+            fetch=True
+        )
+
+        return rows[0][0] if rows else None
+
+    def set_sync_watermark(self, table_id: concepts.TableId, synced_until: datetime.datetime) -> None:
+        self.logger.debug(f'Setting sync watermark of table: {table_id} to: {synced_until}')
+        self._run_query(
+            sql.SQL(
+                '''
+                INSERT INTO {schema}.sync_state (table_id, synced_until)
+                VALUES ({table_id}, {synced_until})
+                ON CONFLICT (table_id) DO UPDATE SET synced_until = {synced_until}
+                '''
+            ).format(
+                schema=sql.Identifier(self.schema),
+                table_id=sql.Literal(table_id),
+                synced_until=sql.Literal(synced_until)
+            ),
+            fetch=False
+        )
+
+    def clear_sync_watermark(self, table_id: concepts.TableId) -> None:
+        self.logger.debug(f'Clearing sync watermark of table: {table_id}')
+        self._run_query(
+            sql.SQL('DELETE FROM {schema}.sync_state WHERE table_id = {table_id}').format(
+                schema=sql.Identifier(self.schema),
+                table_id=sql.Literal(table_id)
+            ),
+            fetch=False
+        )
+
+    def create_sync_checkpoints_table_if_not_exists(self) -> None:
+        self.logger.debug('Creating sync_checkpoints table if it doesnt exist')
+        self._run_query(
+            sql.SQL('''
+                CREATE TABLE IF NOT EXISTS {schema}.sync_checkpoints (
+                    table_id VARCHAR(17) PRIMARY KEY,
+                    stage TEXT NOT NULL,
+                    page_offset TEXT,
+                    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                )
+            ''').format(schema=sql.Identifier(self.schema))
+        )
+
+    def create_bookkeeping_tables_if_not_exist(self) -> None:
+        self.create_table_names_table_if_not_exists()
+        self.create_webhook_state_table_if_not_exists()
+        self.create_sync_state_table_if_not_exists()
+        self.create_sync_checkpoints_table_if_not_exists()
+
+    def get_sync_checkpoint(
+            self,
+            table_id: concepts.TableId
+    ) -> tuple[concepts.SyncStage, concepts.PageOffset | None] | None:
+        rows = self._run_query(
+            sql.SQL('SELECT stage, page_offset FROM {schema}.sync_checkpoints WHERE table_id = {table_id}').format(
+                schema=sql.Identifier(self.schema),
+                table_id=sql.Literal(table_id)
+            ),
+            fetch=True
+        )
+
+        return rows[0] if rows else None
+
+    def save_sync_checkpoint(
+            self,
+            table_id: concepts.TableId,
+            stage: concepts.SyncStage,
+            page_offset: concepts.PageOffset | None = None
+    ) -> None:
+        self.logger.debug(f'Saving checkpoint of table: {table_id} at stage: {stage} and page offset: {page_offset}')
+        self._run_query(
+            sql.SQL(
+                '''
+                INSERT INTO {schema}.sync_checkpoints (table_id, stage, page_offset, updated_at)
+                VALUES ({table_id}, {stage}, {page_offset}, now())
+                ON CONFLICT (table_id) DO UPDATE SET stage = {stage}, page_offset = {page_offset}, updated_at = now()
+                '''
+            ).format(
+                schema=sql.Identifier(self.schema),
+                table_id=sql.Literal(table_id),
+                stage=sql.Literal(stage),
+                page_offset=sql.Literal(page_offset)
+            ),
+            fetch=False
+        )
+
+    def clear_sync_checkpoint(self, table_id: concepts.TableId) -> None:
+        self.logger.debug(f'Clearing checkpoint of table: {table_id}')
+        self._run_query(
+            sql.SQL('DELETE FROM {schema}.sync_checkpoints WHERE table_id = {table_id}').format(
+                schema=sql.Identifier(self.schema),
+                table_id=sql.Literal(table_id)
+            ),
+            fetch=False
+        )
+
+    def clear_sync_checkpoints(self) -> None:
+        self.logger.debug('Clearing all checkpoints')
+        self._run_query(
+            sql.SQL('DELETE FROM {schema}.sync_checkpoints').format(schema=sql.Identifier(self.schema)),
+            fetch=False
+        )
+
     def get_schema(self) -> list[concepts.Table]:
         self.logger.debug('Getting schema')
         query = sql.SQL('''
@@ -64,10 +350,16 @@ class Client:
                 WHERE
                     tables.table_schema = {schema} AND
                     tables.table_type = 'BASE TABLE' AND
-                    tables.table_name IS DISTINCT FROM 'table_names'                    
+                    tables.table_name NOT IN ({bookkeeping_tables})
                 GROUP BY tables.table_name;
             ''')
-        table_info = self._run_query(query.format(schema=self.schema), fetch=True)
+        table_info = self._run_query(
+            query.format(
+                schema=self.schema,
+                bookkeeping_tables=sql.SQL(', ').join(sql.Literal(table) for table in BOOKKEEPING_TABLES)
+            ),
+            fetch=True
+        )
 
         query = sql.SQL('SELECT * FROM {table_path}')
         table_names = self._run_query(query.format(table_path=sql.SQL(f'{self.schema}.table_names')), fetch=True)
@@ -78,7 +370,7 @@ class Client:
                 name=next((name[1] for name in table_names if name[0] == table[0]), None),
                 fields=[
                     concepts.Field(id=field[0], name='Dummy name (FROM DB)', type=field[1])
-                    for field in table[1] if field[0] != 'id' and field != [None, None]
+                    for field in table[1] if field[0] not in ('id', ROW_HASH_COLUMN) and field != [None, None]
                 ]
             ) for table in table_info
         ]
@@ -102,9 +394,10 @@ class Client:
         self._run_query(
             sql.SQL('CREATE TABLE {table_path} (id VARCHAR(17) PRIMARY KEY, {table_definition})').format(
                 table_path=sql.SQL(f'{self.schema}."{table.id}"'),
-                table_definition=sql.SQL(', ').join(
-                    (sql.SQL(f'"{field.id}" {field.type}') for field in table.fields)
-                )
+                table_definition=sql.SQL(', ').join([
+                    *(sql.SQL(f'"{field.id}" {field.type}') for field in table.fields),
+                    *([sql.SQL(f'{ROW_HASH_COLUMN} BYTEA')] if env.value.row_hashes else [])
+                ])
             ),
             fetch=False
         )
@@ -117,6 +410,133 @@ class Client:
             fetch=False
         )
 
+    @property
+    def _row_hash_reset(self) -> list[sql.Composable]:
+        # Partial writes cannot recompute a row's hash, so they clear it instead
+        return [sql.SQL('{column} = NULL').format(column=sql.Identifier(ROW_HASH_COLUMN))] if env.value.row_hashes else []
+
+    def set_up_row_hash_column(self, table_id: concepts.TableId) -> None:
+        self.logger.debug(f'Making sure the row hash column of table: {table_id} matches the config')
+        has_column = bool(self._run_query(
+            sql.SQL(
+                'SELECT 1 FROM information_schema.columns '
+                'WHERE table_schema = {schema} AND table_name = {table_id} AND column_name = {column}'
+            ).format(
+                schema=sql.Literal(self.schema),
+                table_id=sql.Literal(table_id),
+                column=sql.Literal(ROW_HASH_COLUMN)
+            ),
+            fetch=True
+        ))
+
+        if has_column != env.value.row_hashes:
+            self._alter_row_hash_column(table_id)
+
+    def set_up_row_hash_columns(self) -> None:
+        # Partial writes only clear hashes while the option is on, so every table has to agree with the config before
+        # any change is applied, including tables of replications that resume without a table sync
+        self.logger.debug('Making sure the row hash columns of all tables match the config')
+        table_ids = self._run_query(
+            sql.SQL('''
+                SELECT tables.table_name
+                FROM information_schema.tables
+                WHERE
+                    tables.table_schema = {schema} AND
+                    tables.table_type = 'BASE TABLE' AND
+                    tables.table_name NOT IN ({bookkeeping_tables}) AND
+                    {exists} (
+                        SELECT 1 FROM information_schema.columns
+                        WHERE
+                            columns.table_schema = tables.table_schema AND
+                            columns.table_name = tables.table_name AND
+                            columns.column_name = {column}
+                    )
+            ''').format(
+                schema=sql.Literal(self.schema),
+                bookkeeping_tables=sql.SQL(', ').join(sql.Literal(table) for table in BOOKKEEPING_TABLES),
+                exists=sql.SQL('NOT EXISTS' if env.value.row_hashes else 'EXISTS'),
+                column=sql.Literal(ROW_HASH_COLUMN)
+            ),
+            fetch=True
+        )
+
+        for table_id, in table_ids:
+            self._alter_row_hash_column(table_id)
+
+    def _alter_row_hash_column(self, table_id: concepts.TableId) -> None:
+        # Without the option the column is dropped, as nothing would clear hashes that go stale
+        self._run_query(
+            sql.SQL(
+                'ALTER TABLE {table_path} ADD COLUMN {column} BYTEA' if env.value.row_hashes
+                else 'ALTER TABLE {table_path} DROP COLUMN {column}'
+            ).format(
+                table_path=sql.SQL(f'{self.schema}."{table_id}"'),
+                column=sql.Identifier(ROW_HASH_COLUMN)
+            ),
+            fetch=False
+        )
+
+    def get_row_hashes(
+            self,
+            table: concepts.Table,
+            id_filter: list[concepts.RowId]
+    ) -> list[tuple[concepts.RowId, bytes | None]]:
+        self.logger.debug(f'Getting row hashes from table: {table.id}')
+
+        return self._run_query(
+            sql.SQL('SELECT id, {column} FROM {table_path} WHERE id = ANY({id_filter})').format(
+                table_path=sql.SQL(f'{self.schema}."{table.id}"'),
+                column=sql.Identifier(ROW_HASH_COLUMN),
+                id_filter=sql.Literal(id_filter)
+            ),
+            fetch=True
+        )
+
+    def get_row_hash_chunks(
+            self,
+            table: concepts.Table,
+            chunk_size: int | None = None,
+    ) -> typing.Generator[list[tuple[concepts.RowId, bytes | None]], None, None]:
+        self.logger.debug(f'Getting row hashes from table: {table.id}')
+        chunk_size = chunk_size or env.value.row_id_chunk_size
+        last_id = None
+
+        while True:
+            query = sql.SQL(
+                'SELECT id, {column} FROM {table_path} ORDER BY id LIMIT {limit}'
+                if last_id is None else
+                'SELECT id, {column} FROM {table_path} WHERE id > {last_id} ORDER BY id LIMIT {limit}'
+            ).format(
+                table_path=sql.SQL(f'{self.schema}."{table.id}"'),
+                column=sql.Identifier(ROW_HASH_COLUMN),
+                last_id=sql.Literal(last_id),
+                limit=sql.Literal(chunk_size)
+            )
+            results = self._run_query(query, fetch=True)
+
+            if results:
+                yield results
+
+            if len(results) < chunk_size:
+                return
+
+            last_id = results[-1][0]
+
+    def set_row_hashes(self, table_id: concepts.TableId, rows: list[tuple[concepts.RowId, bytes]]) -> None:
+        self.logger.debug(f'Setting {len(rows)} row hashes in table: {table_id}')
+        self._run_query(
+            sql.SQL(
+                'UPDATE {table_path} AS target SET {column} = source.row_hash '
+                'FROM unnest({ids}::text[], {hashes}::bytea[]) AS source (id, row_hash) WHERE target.id = source.id'
+            ).format(
+                table_path=sql.SQL(f'{self.schema}."{table_id}"'),
+                column=sql.Identifier(ROW_HASH_COLUMN),
+                ids=sql.Literal([row_id for row_id, _ in rows]),
+                hashes=sql.Literal([row_hash for _, row_hash in rows])
+            ),
+            fetch=False
+        )
+
     def drop_field(self, table_id: concepts.TableId, field_id: concepts.FieldId) -> None:
         self.logger.debug(f'Dropping field: {field_id} from table: {table_id}')
         self._run_query(
@@ -149,7 +569,7 @@ class Client:
             fetch=False
         )
 
-    def get_rows(self, table: concepts.Table, id_filter: list[concepts.RowId] = None) -> list[concepts.Row]:
+    def get_rows(self, table: concepts.Table, id_filter: list[concepts.RowId] = None) -> concepts.RowBatch:
         self.logger.debug(f'Getting rows from table: {table.id}')
         query = sql.SQL(
             'SELECT id, {columns} FROM {table_path}'
@@ -160,43 +580,293 @@ class Client:
             id_filter=sql.Literal(id_filter)
         )
 
-        return [
-            concepts.Row(
-                id=row[0],
-                field_values=[
-                    concepts.FieldValue(field=field, value=value) for field, value in zip(table.fields, row[1:])
-                ]
-            ) for row in self._run_query(query, fetch=True)
-        ]
+        return concepts.RowBatch.from_records(table.fields, self._run_query(query, fetch=True))
+
+    def stream_rows(
+            self,
+            table: concepts.Table,
+            batch_size: int = 1000
+    ) -> typing.Generator[concepts.RowBatch, None, None]:
+        self.logger.debug(f'Streaming rows from table: {table.id}')
+        query = sql.SQL('SELECT {columns} FROM {table_path}').format(
+            table_path=sql.SQL(f'{self.schema}."{table.id}"'),
+            columns=sql.SQL(', ').join([sql.SQL('id'), *(sql.SQL(f'"{field.id}"') for field in table.fields)])
+        )
+
+        # Named cursors live on the server, so only batch_size rows are held in memory at a time. The connection
+        # stays checked out until the generator is exhausted or closed
+        with self.connection() as connection, connection.transaction():
+
+            with connection.cursor(name=f'stream_{table.id}') as cursor:
+                cursor.itersize = batch_size
+                cursor.execute(query)
+
+                while rows := cursor.fetchmany(batch_size):
+                    yield concepts.RowBatch.from_records(table.fields, rows)
 
     def get_row_id_chunks(
             self,
             table: concepts.Table,
-            chunk_size: int = 100,
+            chunk_size: int | None = None,
     ) -> typing.Generator[list[concepts.RowId], None, None]:
-        self.logger.debug(f'Getting rows from table: {table.id}')
-        query = sql.SQL('SELECT id FROM {table_path} LIMIT {limit} OFFSET {offset}')
+        self.logger.debug(f'Getting row ids from table: {table.id}')
+        chunk_size = chunk_size or env.value.row_id_chunk_size
+        last_id = None
+
+        while True:
+            # Keyset pagination on the primary key stays linear and is not thrown off by rows deleted mid-scan
+            query = sql.SQL(
+                'SELECT id FROM {table_path} ORDER BY id LIMIT {limit}'
+                if last_id is None else 'SELECT id FROM {table_path} WHERE id > {last_id} ORDER BY id LIMIT {limit}'
+            ).format(
+                table_path=sql.SQL(f'{self.schema}."{table.id}"'),
+                last_id=sql.Literal(last_id),
+                limit=sql.Literal(chunk_size)
+            )
+            results = [row[0] for row in self._run_query(query, fetch=True)]
 
-        results = None
-        first_loop = True
-        offset = 0
+            if results:
+                yield results
 
-        while results or first_loop:
+            if len(results) < chunk_size:
+                return
+
+            last_id = results[-1]
+
+    def create_byte_order_index_if_not_exists(self, table_id: concepts.TableId) -> None:
+        # The primary key is ordered by the database collation, the C collation compares ids byte by byte, the same
+        # order Python sorts them in
+        self.logger.debug(f'Creating byte order index on table: {table_id} if it doesnt exist')
+        self._run_query(
+            sql.SQL('CREATE INDEX IF NOT EXISTS {index} ON {table_path} (id COLLATE "C")').format(
+                index=sql.Identifier(f'{table_id}_id_byte_order'),
+                table_path=sql.SQL(f'{self.schema}."{table_id}"')
+            ),
+            fetch=False
+        )
 
-            if first_loop:
-                first_loop = False
+    def get_row_chunks_in_byte_order(
+            self,
+            table: concepts.Table,
+            chunk_size: int | None = None,
+            with_hashes: bool = False
+    ) -> typing.Generator[tuple[concepts.RowBatch, list[bytes | None] | None], None, None]:
+        # Pages through the index made by create_byte_order_index_if_not_exists, so no connection is held between
+        # chunks and the table is never sorted as a whole
+        self.logger.debug(f'Getting rows in byte order from table: {table.id}')
+        chunk_size = chunk_size or env.value.row_id_chunk_size
+        columns = sql.SQL(', ').join([
+            sql.SQL('id'),
+            *(sql.SQL(f'"{field.id}"') for field in table.fields),
+            *([sql.Identifier(ROW_HASH_COLUMN)] if with_hashes else [])
+        ])
+        last_id = None
 
-            formatted_query = query.format(
+        while True:
+            query = sql.SQL('SELECT {columns} FROM {table_path}{after} ORDER BY id COLLATE "C" LIMIT {limit}').format(
+                columns=columns,
                 table_path=sql.SQL(f'{self.schema}."{table.id}"'),
-                columns=sql.SQL(', ').join((sql.SQL(f'"{field.id}"') for field in table.fields)),
-                limit=sql.Literal(chunk_size),
-                offset=sql.Literal(offset)
+                after=sql.SQL('') if last_id is None else sql.SQL(' WHERE id COLLATE "C" > {last_id}').format(
+                    last_id=sql.Literal(last_id)
+                ),
+                limit=sql.Literal(chunk_size)
             )
-            results = [row[0] for row in self._run_query(formatted_query, fetch=True)]
+            results = self._run_query(query, fetch=True)
+
+            if results and with_hashes:
+                yield (
+                    concepts.RowBatch.from_records(table.fields, [row[:-1] for row in results]),
+                    [row[-1] for row in results]
+                )
+
+            elif results:
+                yield concepts.RowBatch.from_records(table.fields, results), None
+
+            if len(results) < chunk_size:
+                return
+
+            last_id = results[-1][0]
+
+    def get_table_sizes(self) -> dict[concepts.TableId, int]:
+        self.logger.debug('Getting table sizes')
+
+        return dict(self._run_query(
+            sql.SQL(
+                '''
+                SELECT c.relname::text, pg_total_relation_size(c.oid)
+                FROM pg_class c
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+                WHERE n.nspname = {schema} AND c.relkind = 'r'
+                '''
+            ).format(schema=sql.Literal(self.schema)),
+            fetch=True
+        ))
+
+    def is_table_empty(self, table_id: concepts.TableId) -> bool:
+        self.logger.debug(f'Checking if table: {table_id} is empty')
+
+        return not self._run_query(
+            sql.SQL('SELECT 1 FROM {table_path} LIMIT 1').format(table_path=sql.SQL(f'{self.schema}."{table_id}"')),
+            fetch=True
+        )
+
+    @staticmethod
+    def _copy_value(field: concepts.Field, value: typing.Any) -> typing.Any:
+        if value is None:
+            return None
+
+        if field.type == 'TEXT[]':
+            values = value if isinstance(value, list) else [value]
+
+            return [None if x is None else str(x) for x in values]
+
+        if field.type == 'BOOLEAN':
+            return bool(value)
+
+        return value
+
+    def _copy_rows_into(
+            self,
+            table_path: sql.Composable,
+            table: concepts.Table,
+            batches: typing.Iterable[concepts.RowBatch]
+    ) -> int:
+        hasher = row_hasher.RowHasher(table.fields) if env.value.row_hashes else None
+        query = sql.SQL('COPY {table_path} ({columns}) FROM STDIN').format(
+            table_path=table_path,
+            columns=sql.SQL(', ').join([
+                sql.SQL('id'),
+                *(sql.SQL(f'"{field.id}"') for field in table.fields),
+                *([sql.Identifier(ROW_HASH_COLUMN)] if hasher else [])
+            ])
+        )
+        # Only arrays and booleans need adapting, every other value is written as it is
+        converted_fields = [
+            (index, field) for index, field in enumerate(table.fields) if field.type in ('TEXT[]', 'BOOLEAN')
+        ]
+        row_count = 0
 
-            yield results
+        with self.connection() as connection, connection.cursor() as cursor:
 
-            offset += chunk_size
+            with cursor.copy(query) as copy:
+
+                for batch in batches:
+
+                    for row_id, values in zip(batch.ids, batch.aligned_values(table.fields)):
+                        row_hash = hasher.hash(values) if hasher else None
+
+                        if converted_fields:
+                            values = list(values)
+
+                            for index, field in converted_fields:
+                                values[index] = self._copy_value(field, values[index])
+
+                        copy.write_row((row_id, *values, row_hash) if hasher else (row_id, *values))
+
+                    row_count += len(batch)
+
+        return row_count
+
+    def copy_rows(self, table: concepts.Table, batches: typing.Iterable[concepts.RowBatch]) -> int:
+        self.logger.debug(f'Copying rows to table: {table.id}')
+
+        return self._copy_rows_into(table_path=sql.SQL(f'{self.schema}."{table.id}"'), table=table, batches=batches)
+
+    def reconcile_rows(
+            self,
+            table: concepts.Table,
+            batches: typing.Iterable[concepts.RowBatch]
+    ) -> tuple[int, int, int]:
+        self.logger.debug(f'Reconciling rows of table: {table.id} through a staging table')
+        table_path = sql.SQL(f'{self.schema}."{table.id}"')
+        staging_path = sql.Identifier(f'staging_{table.id}')
+        columns = [sql.SQL(f'"{field.id}"') for field in table.fields]
+        written_columns = [*columns, sql.Identifier(ROW_HASH_COLUMN)] if env.value.row_hashes else columns
+
+        with self.transaction():
+            self._run_query(
+                sql.SQL('CREATE TEMPORARY TABLE {staging_path} (LIKE {table_path}) ON COMMIT DROP').format(
+                    staging_path=staging_path,
+                    table_path=table_path
+                )
+            )
+            staged = self._copy_rows_into(table_path=staging_path, table=table, batches=batches)
+            self._run_query(sql.SQL('ALTER TABLE {staging_path} ADD PRIMARY KEY (id)').format(staging_path=staging_path))
+            self._run_query(sql.SQL('ANALYZE {staging_path}').format(staging_path=staging_path))
+            self.logger.debug(f'Staged {staged} rows for table: {table.id}')
+
+            deleted = self._run_command(
+                sql.SQL(
+                    'DELETE FROM {table_path} AS target '
+                    'WHERE NOT EXISTS (SELECT 1 FROM {staging_path} AS staged WHERE staged.id = target.id)'
+                ).format(table_path=table_path, staging_path=staging_path)
+            )
+            updated = self._run_command(
+                sql.SQL(
+                    'UPDATE {table_path} AS target SET {assignments} FROM {staging_path} AS staged '
+                    'WHERE target.id = staged.id AND ({differences})'
+                ).format(
+                    table_path=table_path,
+                    staging_path=staging_path,
+                    assignments=sql.SQL(', ').join(
+                        (sql.SQL('{column} = staged.{column}').format(column=column) for column in written_columns)
+                    ),
+                    # Matching hashes mean matching values, so only rows whose hash differs are compared cell by cell
+                    differences=sql.SQL('target.{column} IS DISTINCT FROM staged.{column}').format(
+                        column=sql.Identifier(ROW_HASH_COLUMN)
+                    ) if env.value.row_hashes else sql.SQL(' OR ').join(
+                        (sql.SQL('target.{column} IS DISTINCT FROM staged.{column}').format(column=column)
+                         for column in columns)
+                    )
+                )
+            ) if columns else 0
+            inserted = self._run_command(
+                sql.SQL(
+                    'INSERT INTO {table_path} ({columns}) SELECT {columns} FROM {staging_path} AS staged '
+                    'WHERE NOT EXISTS (SELECT 1 FROM {table_path} AS target WHERE target.id = staged.id)'
+                ).format(
+                    table_path=table_path,
+                    staging_path=staging_path,
+                    columns=sql.SQL(', ').join([sql.SQL('id'), *written_columns])
+                )
+            )
+
+        return deleted, inserted, updated
+
+    def upsert_rows(self, table: concepts.Table, batches: typing.Iterable[concepts.RowBatch]) -> int:
+        self.logger.debug(f'Upserting rows of table: {table.id} through a staging table')
+        table_path = sql.SQL(f'{self.schema}."{table.id}"')
+        staging_path = sql.Identifier(f'upsert_{table.id}')
+        columns = [sql.SQL(f'"{field.id}"') for field in table.fields]
+
+        if env.value.row_hashes:
+            columns.append(sql.Identifier(ROW_HASH_COLUMN))
+
+        with self.transaction():
+            self._run_query(
+                sql.SQL('CREATE TEMPORARY TABLE {staging_path} (LIKE {table_path}) ON COMMIT DROP').format(
+                    staging_path=staging_path,
+                    table_path=table_path
+                )
+            )
+            self._copy_rows_into(table_path=staging_path, table=table, batches=batches)
+
+            # Every column is written, so values cleared in Airtable become NULL as well
+            return self._run_command(
+                sql.SQL(
+                    'INSERT INTO {table_path} ({columns}) SELECT {columns} FROM {staging_path} '
+                    'ON CONFLICT (id) DO {action}'
+                ).format(
+                    table_path=table_path,
+                    staging_path=staging_path,
+                    columns=sql.SQL(', ').join([sql.SQL('id'), *columns]),
+                    action=sql.SQL('UPDATE SET {assignments}').format(
+                        assignments=sql.SQL(', ').join(
+                            (sql.SQL('{column} = EXCLUDED.{column}').format(column=column) for column in columns)
+                        )
+                    ) if columns else sql.SQL('NOTHING')
+                )
+            )
 
     def drop_row(self, table_id: concepts.TableId, row_id: concepts.RowId) -> None:
         self.logger.debug(f'Dropping row: {row_id} from table: {table_id}')
@@ -228,12 +898,13 @@ class Client:
                     field_values=sql.SQL(', ').join(
                         (sql.Literal(field_value.value) for field_value in row.field_values)
                     ),
-                    field_updates=sql.SQL(', ').join(
-                        (sql.SQL('{field_id} = {field_value}').format(
+                    field_updates=sql.SQL(', ').join([
+                        *(sql.SQL('{field_id} = {field_value}').format(
                             field_id=sql.SQL(f'"{field_value.field.id}"'),
                             field_value=sql.Literal(field_value.value)
-                        ) for field_value in row.field_values)
-                    )
+                        ) for field_value in row.field_values),
+                        *self._row_hash_reset
+                    ])
                 ),
                 fetch=False
             )
@@ -255,15 +926,60 @@ class Client:
             value: str
     ) -> None:
         self._run_query(
-            sql.SQL('UPDATE {table_path} SET {field_path} = {value} WHERE id = {row_id}').format(
+            sql.SQL('UPDATE {table_path} SET {assignments} WHERE id = {row_id}').format(
                 table_path=sql.SQL(f'{self.schema}."{table_id}"'),
-                field_path=sql.SQL(f'"{field_id}"'),
-                value=sql.Literal(value),
+                assignments=sql.SQL(', ').join([
+                    sql.SQL('{field_path} = {value}').format(
+                        field_path=sql.SQL(f'"{field_id}"'),
+                        value=sql.Literal(value)
+                    ),
+                    *self._row_hash_reset
+                ]),
                 row_id=sql.Literal(row_id)
             ),
             fetch=False
         )
 
+    @staticmethod
+    def _array_text(transformer: psycopg.adapt.Transformer, value: list) -> str:
+        # Lists are sent in the array syntax update_cell's literals use, so TEXT columns (lookups, rollups) store the
+        # same text whichever path wrote them. Array columns parse the string back into the same array
+        return transformer.get_dumper(value, psycopg.adapt.PyFormat.TEXT).dump(value).decode()
+
+    def update_rows(
+            self,
+            table_id: concepts.TableId,
+            field_ids: list[concepts.FieldId],
+            rows: list[tuple[concepts.RowId, list[typing.Any]]]
+    ) -> None:
+        self.logger.debug(f'Updating {len(field_ids)} columns in {len(rows)} rows of table: {table_id}')
+        transformer = psycopg.adapt.Transformer()
+        # Typing the values through the table's own row type avoids casting every column of a VALUES list
+        self._run_query(
+            sql.SQL(
+                'UPDATE {table_path} AS target SET {assignments} '
+                'FROM jsonb_populate_recordset(NULL::{table_path}, {values}::jsonb) AS source '
+                'WHERE target.id = source.id'
+            ).format(
+                table_path=sql.SQL(f'{self.schema}."{table_id}"'),
+                assignments=sql.SQL(', ').join([
+                    *(sql.SQL(f'"{field_id}" = source."{field_id}"') for field_id in field_ids),
+                    *self._row_hash_reset
+                ]),
+                values=sql.Literal(json.dumps(
+                    [
+                        {'id': row_id, **{
+                            field_id: self._array_text(transformer, value) if isinstance(value, list) else value
+                            for field_id, value in zip(field_ids, values)
+                        }}
+                        for row_id, values in rows
+                    ],
+                    default=str
+                ))
+            ),
+            fetch=False
+        )
+
     def drop_view(self, table: concepts.Table) -> None:
         # Get the view name from the table names table
         view_name = self._run_query(
@@ -309,10 +1025,67 @@ class Client:
             fetch=True
         )]
 
-    def create_view(self, table: concepts.Table):
+    @staticmethod
+    def truncate_identifier(name: str) -> str:
+        # Postgres silently truncates identifiers to 63 bytes
+        return name.encode()[:63].decode(errors='ignore')
+
+    def get_view_fields(self, view_name: str) -> list[tuple[concepts.FieldId, str]] | None:
+        rows = self._run_query(
+            sql.SQL(
+                '''
+                SELECT pg_get_viewdef(c.oid), array_agg(a.attname::text ORDER BY a.attnum)
+                FROM pg_class c
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+                JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0
+                WHERE n.nspname = {schema} AND c.relname = {view_name} AND c.relkind = 'v'
+                GROUP BY c.oid
+                '''
+            ).format(
+                schema=sql.Literal(self.schema),
+                view_name=sql.Literal(self.truncate_identifier(view_name))
+            ),
+            fetch=True
+        )
+
+        if not rows:
+            return None
+
+        definition, column_names = rows[0]
+        field_ids = VIEW_FIELD_PATTERN.findall(definition)
+
+        # Anything other than the shape create_view produces is treated as unknown
+        if column_names[:1] != ['id'] or len(field_ids) != len(column_names) - 1:
+            return None
+
+        return list(zip(field_ids, column_names[1:]))
+
+    def rename_view(self, view_name: str, new_name: str) -> None:
+        self.logger.debug(f'Renaming view: {view_name} to: {new_name}')
+        self._run_query(
+            sql.SQL('ALTER VIEW {view_path} RENAME TO {new_name}').format(
+                view_path=sql.SQL(f'{self.schema}."{view_name}"'),
+                new_name=sql.SQL(f'"{new_name}"')
+            ),
+            fetch=False
+        )
+
+    def rename_view_column(self, view_name: str, column_name: str, new_name: str) -> None:
+        self.logger.debug(f'Renaming column: {column_name} in view: {view_name} to: {new_name}')
+        self._run_query(
+            sql.SQL('ALTER VIEW {view_path} RENAME COLUMN {column_name} TO {new_name}').format(
+                view_path=sql.SQL(f'{self.schema}."{view_name}"'),
+                column_name=sql.SQL(f'"{column_name}"'),
+                new_name=sql.SQL(f'"{new_name}"')
+            ),
+            fetch=False
+        )
+
+    def create_view(self, table: concepts.Table, replace: bool = False):
         self.logger.debug(f'Creating view for table: {table.id}')
         self._run_query(
-            sql.SQL('CREATE VIEW {view_path} AS SELECT id, {columns_and_names} FROM {table_path}').format(
+            sql.SQL('{create} {view_path} AS SELECT id, {columns_and_names} FROM {table_path}').format(
+                create=sql.SQL('CREATE OR REPLACE VIEW' if replace else 'CREATE VIEW'),
                 view_path=sql.SQL(f'{self.schema}."{table.name}"'),
                 table_path=sql.SQL(f'{self.schema}."{table.id}"'),
                 columns_and_names=sql.SQL(', ').join(
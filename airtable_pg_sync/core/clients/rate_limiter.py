@@ -0,0 +1,62 @@
+import threading
+import time
+
+from .. import env
+
+
+class RateLimiter:
+    __limiters: dict[str, 'RateLimiter'] = {}
+    __limiters_lock = threading.Lock()
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        # A bucket of one paces requests evenly, a larger one would let a burst through on top of the rate and break
+        # Airtable's per second limit
+        self.capacity = capacity
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.wait_time = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_base(cls, base_id: str) -> 'RateLimiter':
+        # Airtable's request limit applies per base, so every client of a base shares one bucket
+        with cls.__limiters_lock:
+
+            if base_id not in cls.__limiters:
+                cls.__limiters[base_id] = cls(rate=env.value.airtable_requests_per_second)
+
+            return cls.__limiters[base_id]
+
+    def _refill(self, now: float) -> None:
+        # No tokens accrue while paused
+        start = max(self.updated, self.paused_until)
+
+        if now > start:
+            self.tokens = min(self.capacity, self.tokens + (now - start) * self.rate)
+
+        self.updated = now
+
+    def acquire(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            # The token is reserved before sleeping, so concurrent callers queue up behind each other in order
+            self.tokens -= 1
+            wait = max(0.0, self.paused_until - now) + max(0.0, -self.tokens / self.rate)
+            self.wait_time += wait
+
+        if wait:
+            time.sleep(wait)
+
+        return wait
+
+    def pause(self, seconds: float) -> None:
+        # Hands out no tokens for the next `seconds`. Overlapping pauses, such as several workers hitting a 429 at
+        # once, extend to the latest deadline rather than adding up
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens = min(self.tokens, 0.0)
+            self.paused_until = max(self.paused_until, now + seconds)
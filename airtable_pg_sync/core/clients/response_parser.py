@@ -1,11 +1,21 @@
 import functools
 import itertools
 import logging
+import threading
+import typing
 
 from ..types import changes, concepts
 
+# Values of these types come straight from JSON and need no unpacking before conversion
+SCALAR_TYPES = frozenset({str, int, float, bool})
+
+RowDecoder = typing.Callable[[dict], tuple]
+
 
 class ResponseParser:
+    # Compiled row decoders by table id, together with the fields they were compiled for
+    __row_decoders: dict[concepts.TableId, tuple[tuple, RowDecoder]] = {}
+    __row_decoders_lock = threading.Lock()
 
     @functools.cached_property
     def logger(self) -> logging.Logger:
@@ -54,16 +64,71 @@ class ResponseParser:
 
         return field_value
 
-    def parse_list_of_rows(self, table: concepts.Table, response: dict) -> list[concepts.Row]:
-        fields = {field.name: field for field in table.fields}
+    def _compile_value_decoder(self, field: concepts.Field) -> typing.Callable[[typing.Any], typing.Any]:
+        parse = self.parse_field_value
+
+        if field.type == 'TEXT[]':
+
+            def decode(value):
+
+                if type(value) is list:
+                    return [item if type(item) is str else parse(item) for item in value]
+
+                return parse(value)
+
+            return decode
+
+        convert = concepts.VALUE_PARSER.get(field.type)
+
+        if convert is None:
+            return lambda value: value if type(value) in SCALAR_TYPES else parse(value)
+
+        return lambda value: convert(value) if type(value) in SCALAR_TYPES else convert(parse(value))
+
+    def _compile_row_decoder(self, table: concepts.Table) -> RowDecoder:
+        self.logger.debug(f'Compiling row decoder for table {table.id}')
+        value_decoders = {
+            field.name: (index, self._compile_value_decoder(field)) for index, field in enumerate(table.fields)
+        }
+        width = len(table.fields)
+
+        def decode(record: dict) -> tuple:
+            # Airtable leaves empty cells out, so they stay None
+            values = [None] * width
+
+            for name, value in record['fields'].items():
+
+                if value is not None:
+                    index, decode_value = value_decoders[name]
+                    values[index] = decode_value(value)
+
+            return tuple(values)
+
+        return decode
+
+    def get_row_decoder(self, table: concepts.Table) -> RowDecoder:
+        # A change to any field's id, name or type compiles a new decoder for the table
+        signature = tuple((field.id, field.name, field.type) for field in table.fields)
+        cached = self.__row_decoders.get(table.id)
+
+        if cached and cached[0] == signature:
+            return cached[1]
+
+        decoder = self._compile_row_decoder(table)
+
+        with self.__row_decoders_lock:
+            self.__row_decoders[table.id] = (signature, decoder)
+
+        return decoder
+
+    def parse_list_of_rows(self, table: concepts.Table, response: dict) -> concepts.RowBatch:
+        decode = self.get_row_decoder(table)
 
-        return [concepts.Row(
-            id=row['id'],
-            field_values=[concepts.FieldValue(
-                field=fields[name],
-                value=self.parse_field_value(value)
-            ) for name, value in row['fields'].items()]
-        ) for row in response['records']]
+        return concepts.RowBatch(
+            fields=table.fields,
+            ids=[record['id'] for record in response['records']],
+            values=[decode(record) for record in response['records']]
+        )
 
     def _parse_changed_records_by_id(self, table_id: concepts.TableId, records: dict) -> list[changes.Change]:
         out = []
@@ -26,7 +26,30 @@ def load_config(path: str):
                     base_id=replication['BASE_ID'],
                     schema_name=replication['SCHEMA_NAME'],
                 ) for replication in raw_yaml['AIRTABLE_PG_SYNC']['REPLICATIONS'].values()
-            ]
+            ],
+            set_based_reconciliation=str(
+                raw_yaml['AIRTABLE_PG_SYNC'].get('SET_BASED_RECONCILIATION', '')
+            ).upper() == 'TRUE',
+            db_pool_min_size=int(raw_yaml['AIRTABLE_PG_SYNC'].get('DB_POOL_MIN_SIZE', 1)),
+            db_pool_max_size=int(raw_yaml['AIRTABLE_PG_SYNC'].get('DB_POOL_MAX_SIZE', 10)),
+            row_id_chunk_size=int(raw_yaml['AIRTABLE_PG_SYNC'].get('ROW_ID_CHUNK_SIZE', 1000)),
+            view_sync_debounce_seconds=float(raw_yaml['AIRTABLE_PG_SYNC'].get('VIEW_SYNC_DEBOUNCE_SECONDS', 0)),
+            airtable_requests_per_second=float(
+                raw_yaml['AIRTABLE_PG_SYNC'].get('AIRTABLE_REQUESTS_PER_SECOND', 5)
+            ),
+            airtable_request_deadline_seconds=float(
+                raw_yaml['AIRTABLE_PG_SYNC'].get('AIRTABLE_REQUEST_DEADLINE_SECONDS', 300)
+            ),
+            table_sync_concurrency=int(raw_yaml['AIRTABLE_PG_SYNC'].get('TABLE_SYNC_CONCURRENCY', 1)),
+            replication_sync_concurrency=int(raw_yaml['AIRTABLE_PG_SYNC'].get('REPLICATION_SYNC_CONCURRENCY', 1)),
+            incremental_sync=str(raw_yaml['AIRTABLE_PG_SYNC'].get('INCREMENTAL_SYNC', '')).upper() == 'TRUE',
+            prefetch_depth=int(raw_yaml['AIRTABLE_PG_SYNC'].get('PREFETCH_DEPTH', 2)),
+            row_hashes=str(raw_yaml['AIRTABLE_PG_SYNC'].get('ROW_HASHES', '')).upper() == 'TRUE',
+            merge_join_reconciliation=str(
+                raw_yaml['AIRTABLE_PG_SYNC'].get('MERGE_JOIN_RECONCILIATION', '')
+            ).upper() == 'TRUE',
+            spill_directory=raw_yaml['AIRTABLE_PG_SYNC'].get('SPILL_DIRECTORY'),
+            spill_run_rows=int(raw_yaml['AIRTABLE_PG_SYNC'].get('SPILL_RUN_ROWS', 10000)),
         )
 
     except KeyError as e:
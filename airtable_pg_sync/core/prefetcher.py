@@ -0,0 +1,88 @@
+import functools
+import logging
+import queue
+import threading
+import time
+import typing
+
+T = typing.TypeVar('T')
+
+# Marks the end of the prefetched items
+_DONE = object()
+
+
+class Prefetcher(typing.Generic[T]):
+
+    def __init__(self, items: typing.Iterable[T], depth: int, name: str = 'prefetch'):
+        self.items = items
+        self.depth = depth
+        self.name = name
+        self.wait_time = 0.0
+
+    @functools.cached_property
+    def logger(self) -> logging.Logger:
+        return logging.getLogger(f'Prefetcher: {self.name}')
+
+    @staticmethod
+    def _put(buffer: queue.Queue, stop: threading.Event, entry: tuple[typing.Any, BaseException | None]) -> bool:
+
+        # Times out regularly so that an abandoned producer notices it should stop
+        while not stop.is_set():
+
+            try:
+                buffer.put(entry, timeout=0.1)
+
+                return True
+
+            except queue.Full:
+                continue
+
+        return False
+
+    def _produce(self, buffer: queue.Queue, stop: threading.Event) -> None:
+        error = None
+
+        try:
+
+            for item in self.items:
+
+                if not self._put(buffer, stop, (item, None)):
+                    return
+
+        except BaseException as e:
+            error = e
+
+        finally:
+            # Always sent, even when the producer is interrupted, otherwise the consumer waits forever
+            self._put(buffer, stop, (_DONE, error))
+
+    def __iter__(self) -> typing.Iterator[T]:
+
+        if self.depth < 1:
+            yield from self.items
+
+            return
+
+        # At most depth items are held on top of the one being consumed
+        buffer = queue.Queue(maxsize=self.depth)
+        stop = threading.Event()
+        threading.Thread(target=self._produce, args=(buffer, stop), name=self.name, daemon=True).start()
+
+        try:
+
+            while True:
+                start = time.monotonic()
+                item, error = buffer.get()
+                self.wait_time += time.monotonic() - start
+
+                if error:
+                    raise error
+
+                if item is _DONE:
+                    break
+
+                yield item
+
+        finally:
+            stop.set()
+            self.logger.debug(f'Spent {self.wait_time:.1f}s waiting for prefetched items')
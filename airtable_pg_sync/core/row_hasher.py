@@ -0,0 +1,48 @@
+import hashlib
+import typing
+
+from .types import concepts
+
+try:
+    import numpy
+
+except ImportError:
+    numpy = None
+
+DIGEST_SIZE = 16
+# Stands in for rows without a stored hash, no real digest is expected to be all zeros
+MISSING_DIGEST = bytes(DIGEST_SIZE)
+
+
+class RowHasher:
+
+    def __init__(self, fields: list[concepts.Field]):
+        self.fields = fields
+        # The fields are part of every digest, so a schema change makes all stored hashes stale
+        self._base = hashlib.blake2b(
+            repr([(field.id, field.type) for field in fields]).encode(),
+            digest_size=DIGEST_SIZE
+        )
+
+    def hash(self, values: tuple) -> bytes:
+        # Values are hashed as decoded from Airtable, before any conversion for Postgres
+        digest = self._base.copy()
+        digest.update(repr(values).encode())
+
+        return digest.digest()
+
+    def hash_batch(self, batch: concepts.RowBatch) -> list[bytes]:
+        return [self.hash(values) for values in batch.aligned_values(self.fields)]
+
+    @staticmethod
+    def changed_indices(stored: typing.Sequence[bytes | None], computed: typing.Sequence[bytes]) -> list[int]:
+        stored = [MISSING_DIGEST if digest is None else bytes(digest) for digest in stored]
+
+        if numpy is None:
+            return [index for index, (left, right) in enumerate(zip(stored, computed)) if left != right]
+
+        # Fixed width digests compare as one vectorised operation
+        stored_array = numpy.frombuffer(b''.join(stored), dtype=f'S{DIGEST_SIZE}')
+        computed_array = numpy.frombuffer(b''.join(computed), dtype=f'S{DIGEST_SIZE}')
+
+        return numpy.flatnonzero(stored_array != computed_array).tolist()
@@ -0,0 +1,190 @@
+import dataclasses
+import functools
+import logging
+import threading
+
+from .clients import airtable, postgres
+from .types import changes, concepts, env_types
+
+
+class SchemaCache:
+    __caches: dict[env_types.Replication, 'SchemaCache'] = {}
+    __caches_lock = threading.Lock()
+
+    def __init__(self, replication: env_types.Replication):
+        self.replication = replication
+        self._lock = threading.RLock()
+        self._airtable_tables: dict[concepts.TableId, concepts.Table] | None = None
+        self._pg_tables: dict[concepts.TableId, concepts.Table] | None = None
+
+    @classmethod
+    def for_replication(cls, replication: env_types.Replication) -> 'SchemaCache':
+        with cls.__caches_lock:
+
+            if replication not in cls.__caches:
+                cls.__caches[replication] = cls(replication)
+
+            return cls.__caches[replication]
+
+    @functools.cached_property
+    def logger(self) -> logging.Logger:
+        return logging.getLogger('Schema Cache')
+
+    def airtable_tables(self) -> dict[concepts.TableId, concepts.Table]:
+        with self._lock:
+
+            if self._airtable_tables is None:
+                self.logger.debug(f'Fetching Airtable schema for {self.replication.base_id}')
+                self._airtable_tables = {
+                    table.id: table for table in airtable.Client(self.replication.base_id).get_schema()
+                }
+
+            return dict(self._airtable_tables)
+
+    def pg_tables(self) -> dict[concepts.TableId, concepts.Table]:
+        with self._lock:
+
+            if self._pg_tables is None:
+                self.logger.debug(f'Fetching Postgres schema for {self.replication.schema_name}')
+                self._pg_tables = {
+                    table.id: table for table in postgres.Client(self.replication.schema_name).get_schema()
+                }
+
+            return dict(self._pg_tables)
+
+    def airtable_table(self, table_id: concepts.TableId) -> concepts.Table | None:
+        with self._lock:
+            table = self.airtable_tables().get(table_id)
+
+            if table is None:
+                self.invalidate_airtable()
+                table = self.airtable_tables().get(table_id)
+
+            return table
+
+    def pg_table(self, table_id: concepts.TableId) -> concepts.Table | None:
+        with self._lock:
+            table = self.pg_tables().get(table_id)
+
+            if table is None:
+                self.invalidate_pg()
+                table = self.pg_tables().get(table_id)
+
+            return table
+
+    def invalidate_airtable(self) -> None:
+        with self._lock:
+            self._airtable_tables = None
+
+    def invalidate_pg(self) -> None:
+        with self._lock:
+            self._pg_tables = None
+
+    def invalidate(self) -> None:
+        self.invalidate_airtable()
+        self.invalidate_pg()
+
+    def set_pg_table_name(self, table_id: concepts.TableId, name: str | None) -> None:
+        with self._lock:
+            self._update_table(self._pg_tables, table_id, lambda table: dataclasses.replace(table, name=name))
+
+    @staticmethod
+    def _update_table(tables: dict | None, table_id: concepts.TableId, update) -> None:
+        # Tables are replaced rather than mutated because callers may still hold the previous version
+        if tables is not None and table_id in tables:
+            tables[table_id] = update(tables[table_id])
+
+    @staticmethod
+    def _update_field(tables: dict | None, table_id: concepts.TableId, field_id: concepts.FieldId, update) -> None:
+        SchemaCache._update_table(tables, table_id, lambda table: dataclasses.replace(
+            table,
+            fields=[update(field) if field.id == field_id else field for field in table.fields]
+        ))
+
+    @functools.singledispatchmethod
+    def apply(self, change) -> None:
+        # Row level changes do not affect the schema
+        pass
+
+    @apply.register
+    def _apply_new_table(self, change: changes.NewTable) -> None:
+        with self._lock:
+
+            if self._airtable_tables is not None:
+                self._airtable_tables[change.table.id] = change.table
+
+            if self._pg_tables is not None:
+                self._pg_tables[change.table.id] = dataclasses.replace(change.table, fields=list(change.table.fields))
+
+    @apply.register
+    def _apply_imported_table(self, change: changes.ImportedTable) -> None:
+        self.invalidate_pg()
+
+    @apply.register
+    def _apply_destroyed_table(self, change: changes.DestroyedTable) -> None:
+        with self._lock:
+
+            for tables in (self._airtable_tables, self._pg_tables):
+
+                if tables is not None:
+                    tables.pop(change.table_id, None)
+
+    @apply.register
+    def _apply_table_name_change(self, change: changes.TableNameChange) -> None:
+        # The Postgres side keeps the current view name until the view has been re-synced
+        with self._lock:
+            self._update_table(
+                self._airtable_tables,
+                change.table_id,
+                lambda table: dataclasses.replace(table, name=change.table_name)
+            )
+
+    @apply.register
+    def _apply_new_field(self, change: changes.NewField) -> None:
+        with self._lock:
+
+            for tables in (self._airtable_tables, self._pg_tables):
+                self._update_table(tables, change.table_id, functools.partial(self._with_field, field=change.field))
+
+    @staticmethod
+    def _with_field(table: concepts.Table, field: concepts.Field) -> concepts.Table:
+        # An existing field keeps its position so view column order stays stable
+        if any(existing.id == field.id for existing in table.fields):
+            return dataclasses.replace(
+                table,
+                fields=[field if existing.id == field.id else existing for existing in table.fields]
+            )
+
+        return dataclasses.replace(table, fields=[*table.fields, field])
+
+    @apply.register
+    def _apply_destroyed_field(self, change: changes.DestroyedField) -> None:
+        with self._lock:
+
+            for tables in (self._airtable_tables, self._pg_tables):
+                self._update_table(tables, change.table_id, lambda table: dataclasses.replace(
+                    table,
+                    fields=[field for field in table.fields if field.id != change.field_id]
+                ))
+
+    @apply.register
+    def _apply_field_type_change(self, change: changes.FieldTypeChange) -> None:
+        with self._lock:
+
+            for tables in (self._airtable_tables, self._pg_tables):
+                self._update_field(
+                    tables,
+                    change.table_id,
+                    change.field_id,
+                    lambda field: dataclasses.replace(field, type=change.field_type)
+                )
+
+    @apply.register
+    def _apply_field_name_change(self, change: changes.FieldNameChange) -> None:
+        with self._lock:
+            self._update_field(
+                self._airtable_tables,
+                change.table_id,
+                change.field_id,
+                lambda field: dataclasses.replace(field, name=change.field_name)
+            )
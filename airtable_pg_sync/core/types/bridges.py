@@ -4,6 +4,7 @@ import time
 import typing
 
 from . import concepts, changes, env_types
+from .. import change_compactor
 from ..clients import airtable
 
 
@@ -12,6 +13,7 @@ class Queue:
     def __init__(self):
         self.values: list[changes.ChangeContext] = []
         self.cursors: dict[env_types.Replication, str] = {}
+        self.compactors: dict[env_types.Replication, change_compactor.Compactor] = {}
         self.__generator = None
 
     @functools.cached_property
@@ -21,7 +23,7 @@ class Queue:
     def add(self, id: concepts.ChangeId, replication: env_types.Replication) -> None:
         self.values.append(changes.ChangeContext(id=id, replication=replication))
 
-    def __get_change_group(self) -> list[tuple[changes.ChangeContext, changes.Change]] | None:
+    def __get_change_group(self) -> tuple[changes.ChangeContext, list[changes.Change]] | None:
 
         if self.empty:
             return None
@@ -32,10 +34,19 @@ class Queue:
             cursor=self.cursors.get(change_context.replication),
             webhook_id=change_context.id
         )
+        # Persisted together with the batch, so a restart resumes right after the last applied payload
+        change_context.cursor = self.cursors[change_context.replication]
 
-        return [(change_context, change) for change in received_changes]
+        return change_context, received_changes
 
-    def __get_new_generator(self) -> typing.Generator[tuple[changes.ChangeContext, changes.Change], None, None]:
+    def __get_compactor(self, replication: env_types.Replication) -> change_compactor.Compactor:
+        # One per replication, so its totals cover every batch rather than just the last one
+        if replication not in self.compactors:
+            self.compactors[replication] = change_compactor.Compactor(replication)
+
+        return self.compactors[replication]
+
+    def __get_new_generator(self) -> typing.Generator[tuple[changes.ChangeContext, list[changes.Change]], None, None]:
         iterations_from_change = 0
 
         while True:
@@ -52,9 +63,9 @@ class Queue:
                 continue
 
             iterations_from_change = 0
+            change_context, received_changes = self.__get_change_group()
 
-            for change_context, change in self.__get_change_group():
-                yield change_context, change
+            yield change_context, self.__get_compactor(change_context.replication).compact(received_changes)
 
     @property
     def generator(self):
@@ -63,7 +74,7 @@ class Queue:
 
         return self.__generator
 
-    def __next__(self) -> tuple[changes.ChangeContext, changes.Change]:
+    def __next__(self) -> tuple[changes.ChangeContext, list[changes.Change]]:
         return next(self.generator)
 
     def __iter__(self) -> 'Queue':
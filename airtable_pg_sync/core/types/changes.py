@@ -5,39 +5,58 @@ from . import env_types
 from ..types import concepts
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class CellChange:
     table_id: concepts.TableId
     row_id: concepts.RowId
     field_id: concepts.FieldId
     value: typing.Any
 
+    @classmethod
+    def from_row_diff(
+            cls,
+            table: concepts.Table,
+            row_id: concepts.RowId,
+            pg_values: tuple,
+            airtable_values: tuple
+    ) -> list['CellChange']:
 
-@dataclasses.dataclass
+        if pg_values == airtable_values:
+            return []
+
+        # Cells that are empty in Airtable are None, so they are cleared like any other changed value
+        return [
+            cls(table_id=table.id, row_id=row_id, field_id=field.id, value=airtable_value)
+            for field, pg_value, airtable_value in zip(table.fields, pg_values, airtable_values)
+            if pg_value != airtable_value
+        ]
+
+
+@dataclasses.dataclass(slots=True)
 class NewRow:
     table_id: concepts.TableId
     row: concepts.Row
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class DestroyedRow:
     table_id: concepts.TableId
     row_id: concepts.RowId
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class NewField:
     table_id: concepts.TableId
     field: concepts.Field
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class DestroyedField:
     table_id: concepts.TableId
     field_id: concepts.FieldId
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class FieldTypeChange:
     table_id: concepts.TableId
     field_id: concepts.FieldId
@@ -59,29 +78,29 @@ class FieldTypeChange:
             raise concepts.UnknownType(f'Unknown type ({self.field_type}) found for field (id: {self.field_id})')
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class FieldNameChange:
     table_id: concepts.TableId
     field_id: concepts.FieldId
     field_name: str
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class NewTable:
     table: concepts.Table
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class DestroyedTable:
     table_id: concepts.TableId
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class TableNameChange:
     table_id: concepts.TableId
     table_name: str
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class ImportedTable:
     table_id: concepts.TableId
 
@@ -100,7 +119,8 @@ Change = typing.Union[
 ]
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class ChangeContext:
     id: concepts.ChangeId
     replication: env_types.Replication
+    cursor: concepts.WebhookCursor | None = None
@@ -46,12 +46,31 @@ TYPE_MAPPING = {
 
 DB_TYPES = ['TEXT', 'FLOAT', 'BOOLEAN', 'TIMESTAMP', 'TEXT[]', 'INTEGER']
 
+# Stages of a table's initial sync in the order they complete, as recorded in checkpoints
+SYNC_STAGES = ['schema', 'rows', 'view']
+
 
 def parse_timestamp(timestamp: str | datetime.datetime) -> str | None:
     if not timestamp:
         return None
 
-    time_stamp = parser.parse(str(timestamp))
+    if isinstance(timestamp, datetime.datetime):
+        return timestamp.replace(tzinfo=None).isoformat(timespec='seconds')
+
+    time_stamp = None
+
+    if isinstance(timestamp, str):
+
+        try:
+            # Airtable sends ISO 8601 in UTC, the zone is dropped anyway and older Pythons do not accept the Z suffix
+            time_stamp = datetime.datetime.fromisoformat(timestamp[:-1] if timestamp.endswith('Z') else timestamp)
+
+        except ValueError:
+            pass
+
+    # Anything else, including values that are not strings, is parsed as it always was
+    if time_stamp is None:
+        time_stamp = parser.parse(str(timestamp))
 
     return time_stamp.replace(tzinfo=None).isoformat(timespec='seconds')
 
@@ -72,7 +91,7 @@ class UnknownType(Exception):
 FieldId = typing.Annotated[str, 'Field ID']
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class Field:
     id: FieldId
     name: str
@@ -99,7 +118,7 @@ class Field:
 TableId = typing.Annotated[str, 'Table ID']
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class Table:
     id: TableId
     name: str | None
@@ -109,7 +128,7 @@ class Table:
         self.id = self.id.strip()
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class FieldValue:
     field: Field
     value: str
@@ -118,17 +137,81 @@ class FieldValue:
         parser = VALUE_PARSER.get(self.field.type)
         self.value = parser(self.value) if parser and self.value is not None else self.value
 
+    @classmethod
+    def from_parsed(cls, field: Field, value: typing.Any) -> 'FieldValue':
+        # Skips __post_init__ for values that have already been converted to the field's type
+        field_value = cls.__new__(cls)
+        field_value.field = field
+        field_value.value = value
+
+        return field_value
+
 
 RowId = typing.Annotated[str, 'Row ID']
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class Row:
     id: RowId
     field_values: list[FieldValue]
 
+    @classmethod
+    def from_values(cls, row_id: RowId, fields: list[Field], values: tuple) -> 'Row':
+        return cls(
+            id=row_id,
+            field_values=[
+                FieldValue.from_parsed(field, value) for field, value in zip(fields, values) if value is not None
+            ]
+        )
+
+
+@dataclasses.dataclass(slots=True)
+class RowBatch:
+    # Rows of one table as a value tuple per row, aligned to the shared fields, with None for empty cells
+    fields: list[Field]
+    ids: list[RowId]
+    values: list[tuple]
+
+    @classmethod
+    def from_records(cls, fields: list[Field], records: typing.Iterable[tuple]) -> 'RowBatch':
+        # Records are (id, *values) as read from Postgres, their values are converted the same way as FieldValue does
+        parsers = [(index, VALUE_PARSER[field.type]) for index, field in enumerate(fields) if field.type in VALUE_PARSER]
+        ids = []
+        rows = []
+
+        for record in records:
+            ids.append(record[0])
+            values = list(record[1:])
+
+            for index, parser in parsers:
+
+                if values[index] is not None:
+                    values[index] = parser(values[index])
+
+            rows.append(tuple(values))
+
+        return cls(fields=fields, ids=ids, values=rows)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self) -> typing.Iterator[tuple[RowId, tuple]]:
+        return zip(self.ids, self.values)
+
+    def aligned_values(self, fields: list[Field]) -> typing.Iterable[tuple]:
+
+        if [field.id for field in fields] == [field.id for field in self.fields]:
+            return self.values
+
+        positions = {field.id: index for index, field in enumerate(self.fields)}
+        indices = [positions.get(field.id) for field in fields]
+
+        return (tuple(None if index is None else values[index] for index in indices) for values in self.values)
+
 
 ChangeId = typing.Annotated[str, 'Change ID']
 WebhookId = typing.Annotated[str, 'Webhook ID']
 WebhookUrl = typing.Annotated[str, 'Webhook URL']
 WebhookCursor = typing.Annotated[str, 'Webhook Cursor']
+SyncStage = typing.Annotated[str, 'Sync Stage']
+PageOffset = typing.Annotated[str, 'Page Offset']
@@ -23,6 +23,21 @@ class Config:
     db_password: str
     db_name: str
     replications: list[Replication]
+    set_based_reconciliation: bool = False
+    db_pool_min_size: int = 1
+    db_pool_max_size: int = 10
+    row_id_chunk_size: int = 1000
+    view_sync_debounce_seconds: float = 0
+    airtable_requests_per_second: float = 5
+    airtable_request_deadline_seconds: float = 300
+    table_sync_concurrency: int = 1
+    replication_sync_concurrency: int = 1
+    incremental_sync: bool = False
+    prefetch_depth: int = 2
+    row_hashes: bool = False
+    merge_join_reconciliation: bool = False
+    spill_directory: str | None = None
+    spill_run_rows: int = 10000
 
     def __post_init__(self):
         self.webhook_url = self.webhook_url.strip('/') + '/'
@@ -0,0 +1,55 @@
+import functools
+import itertools
+import logging
+import time
+
+from ..core import env
+from ..core.clients import airtable, postgres
+from ..core.types import concepts, env_types
+
+# Pages copied per transaction, each committed together with the offset to resume from
+CHECKPOINT_PAGES = 50
+
+
+class BulkLoader:
+
+    def __init__(
+            self,
+            replication: env_types.Replication,
+            table: concepts.Table,
+            offset: concepts.PageOffset | None = None
+    ):
+        self.replication = replication
+        self.table = table
+        self.offset = offset
+
+    @functools.cached_property
+    def logger(self) -> logging.Logger:
+        return logging.getLogger(f'Bulk Loader: {self.table.id}')
+
+    def sync(self) -> None:
+
+        if self.offset:
+            self.logger.info(f'Resuming bulk load with COPY from page offset {self.offset}')
+
+        else:
+            self.logger.info('Table is empty - bulk loading rows with COPY')
+
+        start = time.monotonic()
+        client = postgres.Client(self.replication.schema_name)
+        pages = iter(airtable.Client(self.replication.base_id).get_pages(
+            table=self.table,
+            offset=self.offset,
+            prefetch_depth=env.value.prefetch_depth
+        ))
+        row_count = 0
+
+        while chunk := list(itertools.islice(pages, CHECKPOINT_PAGES)):
+
+            with postgres.Client.transaction():
+                row_count += client.copy_rows(table=self.table, batches=(batch for batch, _ in chunk))
+                client.save_sync_checkpoint(table_id=self.table.id, stage='schema', page_offset=chunk[-1][1])
+
+        elapsed = time.monotonic() - start
+        rate = row_count / elapsed if elapsed else float(row_count)
+        self.logger.info(f'Loaded {row_count} rows in {elapsed:.1f}s ({rate:.0f} rows/s)')
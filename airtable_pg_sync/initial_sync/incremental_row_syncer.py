@@ -0,0 +1,53 @@
+import datetime
+import functools
+import logging
+
+from ..core import change_handler, env
+from ..core.clients import airtable, postgres
+from ..core.types import changes, concepts, env_types
+
+
+class RowSyncer:
+
+    def __init__(self, replication: env_types.Replication, table: concepts.Table, modified_after: datetime.datetime):
+        self.replication = replication
+        self.table = table
+        self.modified_after = modified_after
+
+    @functools.cached_property
+    def logger(self) -> logging.Logger:
+        return logging.getLogger(f'Row Syncer: {self.table.id}')
+
+    @property
+    def _formula(self) -> str:
+        modified_after = self.modified_after.astimezone(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.000Z')
+
+        return f"IS_AFTER(LAST_MODIFIED_TIME(), '{modified_after}')"
+
+    def _remove_extra_rows(self) -> None:
+        # Deletions do not show up as modified records, so they are found by comparing ids
+        airtable_row_ids = set(airtable.Client(self.replication.base_id).get_row_ids(table=self.table))
+        handler = change_handler.Handler(self.replication)
+
+        for chunk in postgres.Client(self.replication.schema_name).get_row_id_chunks(table=self.table):
+            extra_row_ids = [row_id for row_id in chunk if row_id not in airtable_row_ids]
+
+            if extra_row_ids:
+                self.logger.info(f'Found {len(extra_row_ids)} rows that need to be destroyed')
+
+            handler.handle_changes([
+                changes.DestroyedRow(table_id=self.table.id, row_id=row_id) for row_id in extra_row_ids
+            ])
+
+    def sync(self) -> None:
+        self.logger.info(f'Syncing rows modified after {self.modified_after.isoformat()}')
+        self._remove_extra_rows()
+        upserted = postgres.Client(self.replication.schema_name).upsert_rows(
+            table=self.table,
+            batches=airtable.Client(self.replication.base_id).get_row_batches(
+                table=self.table,
+                formula=self._formula,
+                prefetch_depth=env.value.prefetch_depth
+            )
+        )
+        self.logger.info(f'Upserted {upserted} modified rows')
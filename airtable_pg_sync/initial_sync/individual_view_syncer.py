@@ -2,7 +2,8 @@ import functools
 import logging
 import time
 
-from ..core.clients import postgres, airtable
+from ..core import schema_cache
+from ..core.clients import postgres
 from ..core.types import concepts, env_types
 
 
@@ -10,15 +11,10 @@ class IndividualViewSyncer:
 
     def __init__(self, replication: env_types.Replication, pg_table: concepts.Table | concepts.TableId):
         self.replication = replication
+        self.schema_cache = schema_cache.SchemaCache.for_replication(replication)
 
         if not isinstance(pg_table, concepts.Table):
-            self.pg_table = next(
-                (
-                    table for table in postgres.Client(self.replication.schema_name).get_schema()
-                    if table.id == pg_table
-                ),
-                None
-            )
+            self.pg_table = self.schema_cache.pg_table(pg_table)
 
         else:
             self.pg_table = pg_table
@@ -30,40 +26,42 @@ class IndividualViewSyncer:
     @functools.cached_property
     def airtable_table(self) -> concepts.Table | None:
         self.logger.debug('Getting schema from Airtable')
+        out = self.schema_cache.airtable_tables().get(self.pg_table.id)
         trys = 0
-        out = None
 
-        while trys < 5:
-            out = next(
-                (table for table in airtable.Client(self.replication.base_id).get_schema() if table.id == self.pg_table.id),
-                None
-            )
-            trys += 1
+        # Only a miss goes back to Airtable, in case the cached schema predates the table
+        while not out and trys < 5:
 
-            if out:
-                break
+            if trys:
+                self.logger.info(f'Could not find table {self.pg_table.id} in Airtable. Trying again in 0.5 seconds')
+                time.sleep(0.5)
 
-            self.logger.info(f'Could not find table {self.pg_table.id} in Airtable. Trying again in 0.5 seconds')
-            time.sleep(0.5)
+            self.schema_cache.invalidate_airtable()
+            out = self.schema_cache.airtable_tables().get(self.pg_table.id)
+            trys += 1
 
         return out
 
     def drop_view(self) -> None:
         self.logger.info(f'Dropping view {self.pg_table.name}')
         postgres.Client(self.replication.schema_name).drop_view(self.pg_table)
+        self.schema_cache.set_pg_table_name(self.pg_table.id, None)
 
-    def create_view(self) -> None:
-        self.logger.info(f'Creating view {self.pg_table.name}')
+    @functools.cached_property
+    def desired_view(self) -> concepts.Table:
         db_table_fields = {field.id for field in self.pg_table.fields}
-        airtable_table_restricted_to_current_db_columns = concepts.Table(
+
+        return concepts.Table(
             id=self.pg_table.id,
             name=self.airtable_table.name,
             fields=[field for field in self.airtable_table.fields if field.id in db_table_fields],
         )
-        postgres.Client(self.replication.schema_name).create_view(
-            table=airtable_table_restricted_to_current_db_columns
-        )
+
+    def create_view(self) -> None:
+        self.logger.info(f'Creating view {self.pg_table.name}')
+        postgres.Client(self.replication.schema_name).create_view(table=self.desired_view)
         postgres.Client(self.replication.schema_name).update_table_name(table=self.airtable_table)
+        self.schema_cache.set_pg_table_name(self.pg_table.id, self.airtable_table.name)
 
     def sync(self) -> None:
         if not self.airtable_table:
@@ -72,6 +70,63 @@ class IndividualViewSyncer:
 
             return
 
-        self.logger.info(f'Syncing view {self.airtable_table.name}')
-        self.drop_view()
-        self.create_view()
+        current_fields = None
+
+        if self.pg_table.name:
+            current_fields = postgres.Client(self.replication.schema_name).get_view_fields(self.pg_table.name)
+
+        if current_fields is None or not self._can_alter_view(current_fields):
+            self.logger.info(f'Syncing view {self.airtable_table.name}')
+            self.drop_view()
+            self.create_view()
+
+            return
+
+        self._alter_view(current_fields)
+
+    def _can_alter_view(self, current_fields: list[tuple[concepts.FieldId, str]]) -> bool:
+        desired_fields = self.desired_view.fields
+
+        # Existing columns can only be renamed in place, and new ones only appended
+        if [field_id for field_id, _ in current_fields] != [field.id for field in desired_fields[:len(current_fields)]]:
+            return False
+
+        current_names = [name for _, name in current_fields]
+        desired_names = [postgres.Client.truncate_identifier(field.name) for field in desired_fields]
+
+        # A rename onto a name another column currently holds (e.g. a swap) cannot be done column by column
+        return all(
+            desired_name == current_name or desired_name not in current_names
+            for current_name, desired_name in zip(current_names, desired_names)
+        )
+
+    def _alter_view(self, current_fields: list[tuple[concepts.FieldId, str]]) -> None:
+        client = postgres.Client(self.replication.schema_name)
+        view_name = self.pg_table.name
+        desired_name = postgres.Client.truncate_identifier(self.airtable_table.name)
+        altered = False
+
+        if postgres.Client.truncate_identifier(view_name) != desired_name:
+            self.logger.info(f'Renaming view {view_name} to {self.airtable_table.name}')
+            client.rename_view(view_name, self.airtable_table.name)
+            client.update_table_name(table=self.airtable_table)
+            self.schema_cache.set_pg_table_name(self.pg_table.id, self.airtable_table.name)
+            view_name = self.airtable_table.name
+            altered = True
+
+        for (_, current_name), field in zip(current_fields, self.desired_view.fields):
+
+            if current_name != postgres.Client.truncate_identifier(field.name):
+                self.logger.info(f'Renaming column {current_name} in view {view_name} to {field.name}')
+                client.rename_view_column(view_name, current_name, field.name)
+                altered = True
+
+        if len(self.desired_view.fields) > len(current_fields):
+            self.logger.info(
+                f'Adding {len(self.desired_view.fields) - len(current_fields)} columns to view {view_name}'
+            )
+            client.create_view(table=self.desired_view, replace=True)
+            altered = True
+
+        if not altered:
+            self.logger.debug(f'View {view_name} is already up to date')
@@ -3,6 +3,7 @@ import logging
 import logging.config
 
 from . import schema_syncer, view_syncer
+from ..core.clients import airtable, postgres, rate_limiter
 from ..core.types import env_types
 
 
@@ -20,4 +21,12 @@ class InitialSyncer:
         self.logger.info(f'Starting initial sync {self.replication.base_id} -> {self.replication.schema_name}')
         schema_syncer.SchemaSyncer(self.replication).sync()
         view_syncer.ViewSyncer(self.replication).sync()
+        # The next initial sync has to start from scratch
+        postgres.Client(self.replication.schema_name).clear_sync_checkpoints()
+        self.logger.info(
+            f'Spent {rate_limiter.RateLimiter.for_base(self.replication.base_id).wait_time:.1f}s in total waiting '
+            f'for the Airtable rate limit of {self.replication.base_id}, '
+            f'and {airtable.Client.backoff_time[self.replication.base_id]:.1f}s backing off over '
+            f'{airtable.Client.retries[self.replication.base_id]} retries'
+        )
         self.logger.info(f'Finished initial sync {self.replication.base_id} -> {self.replication.schema_name}')
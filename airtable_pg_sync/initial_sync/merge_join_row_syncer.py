@@ -0,0 +1,184 @@
+import collections
+import functools
+import gzip
+import heapq
+import logging
+import operator
+import os
+import pickle
+import tempfile
+import typing
+
+from ..core import change_handler, env, row_hasher
+from ..core.clients import airtable, postgres
+from ..core.types import changes, concepts, env_types
+
+# Run files are written once and read once, so cheap compression is worth more than a small file
+RUN_COMPRESSION_LEVEL = 1
+
+SpilledRow = tuple[concepts.RowId, tuple]
+# A Postgres row's values together with its stored hash, None while row hashes are off or the hash was cleared
+PgRow = tuple[tuple, bytes | None]
+
+
+class RowSyncer:
+
+    def __init__(self, replication: env_types.Replication, table: concepts.Table):
+        self.replication = replication
+        self.table = table
+
+    @functools.cached_property
+    def logger(self) -> logging.Logger:
+        return logging.getLogger(f'Row Syncer: {self.table.id}')
+
+    @functools.cached_property
+    def _handler(self) -> change_handler.Handler:
+        return change_handler.Handler(replication=self.replication)
+
+    @functools.cached_property
+    def _hasher(self) -> row_hasher.RowHasher | None:
+        return row_hasher.RowHasher(self.table.fields) if env.value.row_hashes else None
+
+    @staticmethod
+    def _write_run(path: str, rows: list[SpilledRow]) -> None:
+        rows.sort(key=operator.itemgetter(0))
+
+        with gzip.open(path, 'wb', compresslevel=RUN_COMPRESSION_LEVEL) as run:
+
+            for row in rows:
+                pickle.dump(row, run, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _read_run(path: str) -> typing.Generator[SpilledRow, None, None]:
+
+        with gzip.open(path, 'rb') as run:
+
+            while True:
+
+                try:
+                    yield pickle.load(run)
+
+                except EOFError:
+                    return
+
+    def _spill_airtable_rows(self, directory: str) -> list[str]:
+        # At most one run of rows is held in memory, each is sorted by record id before it is written out
+        paths: list[str] = []
+        rows: list[SpilledRow] = []
+        row_count = 0
+
+        for batch in airtable.Client(self.replication.base_id).get_row_batches(
+                table=self.table,
+                prefetch_depth=env.value.prefetch_depth
+        ):
+            rows.extend(batch)
+            row_count += len(batch)
+
+            if len(rows) >= env.value.spill_run_rows:
+                paths.append(os.path.join(directory, f'run_{len(paths)}.gz'))
+                self._write_run(paths[-1], rows)
+                rows = []
+
+        if rows:
+            paths.append(os.path.join(directory, f'run_{len(paths)}.gz'))
+            self._write_run(paths[-1], rows)
+
+        self.logger.info(f'Spilled {row_count} Airtable rows to {len(paths)} sorted runs')
+
+        return paths
+
+    def _stream_pg_rows(self) -> typing.Generator[tuple[concepts.RowId, PgRow], None, None]:
+        client = postgres.Client(self.replication.schema_name)
+        client.create_byte_order_index_if_not_exists(self.table.id)
+
+        # Each chunk is a separate keyset query, so no connection stays checked out while changes are applied in between
+        for batch, hashes in client.get_row_chunks_in_byte_order(table=self.table, with_hashes=bool(self._hasher)):
+
+            for index, (row_id, values) in enumerate(batch):
+                yield row_id, (values, hashes[index] if hashes else None)
+
+    @staticmethod
+    def _merge_join(
+            airtable_rows: typing.Iterator[SpilledRow],
+            pg_rows: typing.Iterator[tuple[concepts.RowId, PgRow]]
+    ) -> typing.Generator[tuple[concepts.RowId, tuple | None, PgRow | None], None, None]:
+        # Both sides are ordered by record id, so each row is looked at exactly once. Yields the row id with the
+        # Airtable values and the Postgres row, either of which is None when the row only exists on the other side
+        airtable_row = next(airtable_rows, None)
+        pg_row = next(pg_rows, None)
+
+        while airtable_row is not None or pg_row is not None:
+
+            if pg_row is None or (airtable_row is not None and airtable_row[0] < pg_row[0]):
+                yield airtable_row[0], airtable_row[1], None
+                airtable_row = next(airtable_rows, None)
+
+            elif airtable_row is None or pg_row[0] < airtable_row[0]:
+                yield pg_row[0], None, pg_row[1]
+                pg_row = next(pg_rows, None)
+
+            else:
+                yield airtable_row[0], airtable_row[1], pg_row[1]
+                airtable_row = next(airtable_rows, None)
+                pg_row = next(pg_rows, None)
+
+    def _get_row_changes(
+            self,
+            row_id: concepts.RowId,
+            airtable_values: tuple | None,
+            pg_row: PgRow | None
+    ) -> list[changes.Change]:
+
+        if airtable_values is None:
+            return [changes.DestroyedRow(table_id=self.table.id, row_id=row_id)]
+
+        if pg_row is None:
+            return [changes.NewRow(
+                table_id=self.table.id,
+                row=concepts.Row.from_values(row_id, self.table.fields, airtable_values)
+            )]
+
+        return changes.CellChange.from_row_diff(self.table, row_id, pg_row[0], airtable_values)
+
+    def _apply(self, pending_changes: list[changes.Change], pending_hashes: list[tuple[concepts.RowId, bytes]]) -> None:
+        self._handler.handle_changes(pending_changes)
+
+        # Applying the changes cleared the hashes of the rows involved, they now match Airtable again
+        if pending_hashes:
+            postgres.Client(self.replication.schema_name).set_row_hashes(table_id=self.table.id, rows=pending_hashes)
+
+    def sync(self) -> None:
+        self.logger.info('Merge joining table rows through sorted runs on disk')
+        change_counts = collections.Counter()
+        pending_changes: list[changes.Change] = []
+        pending_hashes: list[tuple[concepts.RowId, bytes]] = []
+
+        with tempfile.TemporaryDirectory(dir=env.value.spill_directory, prefix=f'airtable_pg_sync_{self.table.id}_') \
+                as directory:
+            paths = self._spill_airtable_rows(directory)
+            airtable_rows = heapq.merge(*(self._read_run(path) for path in paths), key=operator.itemgetter(0))
+
+            # Changes are applied as they are found so that memory stays bounded on both sides
+            for row_id, airtable_values, pg_row in self._merge_join(iter(airtable_rows), self._stream_pg_rows()):
+                row_changes = self._get_row_changes(row_id, airtable_values, pg_row)
+                change_counts.update(type(change).__name__ for change in row_changes)
+                pending_changes.extend(row_changes)
+
+                if self._hasher and airtable_values is not None:
+                    row_hash = self._hasher.hash(airtable_values)
+
+                    # Written rows lose their hash, unchanged rows only need one when theirs is missing or stale
+                    if row_changes or row_hash != pg_row[1]:
+                        pending_hashes.append((row_id, row_hash))
+
+                if len(pending_changes) >= env.value.row_id_chunk_size or \
+                        len(pending_hashes) >= env.value.row_id_chunk_size:
+                    self._apply(pending_changes, pending_hashes)
+                    pending_changes, pending_hashes = [], []
+
+            self._apply(pending_changes, pending_hashes)
+
+        self.logger.info(
+            f'Destroyed {change_counts["DestroyedRow"]} rows, created {change_counts["NewRow"]} rows '
+            f'and updated {change_counts["CellChange"]} cells'
+        )
@@ -1,8 +1,7 @@
 import functools
-import itertools
 import logging
 
-from ..core import change_handler
+from ..core import change_handler, env, row_hasher
 from ..core.clients import airtable, postgres
 from ..core.types import concepts, env_types, changes
 
@@ -23,73 +22,62 @@ class RowSyncer:
             replication=self.replication,
         )
 
+    @functools.cached_property
+    def _hasher(self) -> row_hasher.RowHasher:
+        return row_hasher.RowHasher(self.table.fields)
+
     def _remove_extra_rows(self) -> None:
+        # Only ids are held in memory, the Postgres side is streamed past them chunk by chunk
+        airtable_row_ids = set(airtable.Client(self.replication.base_id).get_row_ids(table=self.table))
         pg_row_id_chunks = postgres.Client(self.replication.schema_name).get_row_id_chunks(table=self.table)
 
         for chunk in pg_row_id_chunks:
-            matched_airtable_ids = airtable.Client(self.replication.base_id).get_matching_ids(
-                table=self.table,
-                row_ids=chunk
-            )
-            extra_row_ids = set(chunk) - set(matched_airtable_ids)
+            extra_row_ids = [row_id for row_id in chunk if row_id not in airtable_row_ids]
 
             if extra_row_ids:
                 self.logger.info(f'Found {len(extra_row_ids)} rows that need to be destroyed')
 
-            for row_id in extra_row_ids:
-                self._handler.handle_change(
-                    changes.DestroyedRow(
-                        table_id=self.table.id,
-                        row_id=row_id
-                    )
-                )
+            self._handler.handle_changes([
+                changes.DestroyedRow(table_id=self.table.id, row_id=row_id) for row_id in extra_row_ids
+            ])
 
-    def _get_cell_changes(self, pg_row: concepts.Row, airtable_row: concepts.Row) -> list[changes.CellChange]:
-        pg_field_values = {field_value.field.id: field_value for field_value in pg_row.field_values}
-        airtable_field_values = {field_value.field.id: field_value for field_value in airtable_row.field_values}
+    def _get_rows_to_compare(
+            self,
+            batch: concepts.RowBatch,
+            hashes: dict[concepts.RowId, bytes] | None
+    ) -> tuple[set[concepts.RowId], concepts.RowBatch]:
+        # Returns which of the batch's rows exist in Postgres, and the full Postgres rows that need comparing
+        client = postgres.Client(self.replication.schema_name)
 
-        cell_changes = []
+        if hashes is None:
+            pg_rows = client.get_rows(table=self.table, id_filter=batch.ids)
 
-        for field_id in pg_field_values:
+            return set(pg_rows.ids), pg_rows
 
-            # Case when null in airtable
-            if field_id not in airtable_field_values:
+        stored_hashes = client.get_row_hashes(table=self.table, id_filter=batch.ids)
+        changed_row_ids = [stored_hashes[index][0] for index in row_hasher.RowHasher.changed_indices(
+            [row_hash for _, row_hash in stored_hashes],
+            [hashes[row_id] for row_id, _ in stored_hashes]
+        )]
 
-                if pg_field_values[field_id].value is not None:
-                    cell_changes.append(
-                        changes.CellChange(
-                            table_id=self.table.id,
-                            row_id=pg_row.id,
-                            field_id=field_id,
-                            value=None
-                        )
-                    )
-
-            # Case when values are different
-            elif pg_field_values[field_id].value != airtable_field_values[field_id].value:
-                cell_changes.append(
-                    changes.CellChange(
-                        table_id=self.table.id,
-                        row_id=pg_row.id,
-                        field_id=field_id,
-                        value=airtable_field_values[field_id].value
-                    )
-                )
-
-        return cell_changes
+        return {row_id for row_id, _ in stored_hashes}, client.get_rows(
+            table=self.table,
+            id_filter=changed_row_ids
+        ) if changed_row_ids else concepts.RowBatch(fields=self.table.fields, ids=[], values=[])
 
     def _create_missing_rows_and_update_cell_values(self) -> None:
-        airtable_rows = airtable.Client(self.replication.base_id).get_rows(table=self.table)
-
-        chunk = {row.id: row for row in list(itertools.islice(airtable_rows, 100))}
+        # The next pages are fetched from Airtable while the current one is compared and written to Postgres
+        pages = airtable.Client(self.replication.base_id).get_pages(
+            table=self.table,
+            prefetch_depth=env.value.prefetch_depth
+        )
 
-        while chunk:
-            pg_rows = postgres.Client(self.replication.schema_name).get_rows(
-                table=self.table,
-                id_filter=list(chunk.keys())
-            )
+        for batch, _ in pages:
+            chunk = dict(batch)
+            hashes = dict(zip(batch.ids, self._hasher.hash_batch(batch))) if env.value.row_hashes else None
+            pg_row_ids, pg_rows = self._get_rows_to_compare(batch, hashes)
             # Add missing rows
-            missing_row_ids = {id for id in chunk} - {row.id for row in pg_rows}
+            missing_row_ids = set(chunk) - pg_row_ids
 
             if missing_row_ids:
                 self.logger.info(f'Found {len(missing_row_ids)} rows that need to be created')
@@ -98,22 +86,29 @@ class RowSyncer:
                 self._handler.handle_change(
                     changes.NewRow(
                         table_id=self.table.id,
-                        row=chunk[row_id]
+                        row=concepts.Row.from_values(row_id, batch.fields, chunk[row_id])
                     )
                 )
 
             # Update cell values
-            for pg_row in pg_rows:
-                airtable_row = chunk[pg_row.id]
-                cell_changes = self._get_cell_changes(pg_row=pg_row, airtable_row=airtable_row)
+            chunk_cell_changes = []
+
+            for row_id, pg_values in pg_rows:
+                cell_changes = changes.CellChange.from_row_diff(self.table, row_id, pg_values, chunk[row_id])
 
                 if cell_changes:
-                    self.logger.info(f'Found {len(cell_changes)} cell changes that need to be applied on row {pg_row.id}')
+                    self.logger.info(f'Found {len(cell_changes)} cell changes that need to be applied on row {row_id}')
 
-                for change in cell_changes:
-                    self._handler.handle_change(change)
+                chunk_cell_changes.extend(cell_changes)
 
-            chunk = {row.id: row for row in list(itertools.islice(airtable_rows, 100))}
+            self._handler.handle_changes(chunk_cell_changes)
+
+            # Applying the changes cleared the hashes of the rows involved, they now match Airtable again
+            if hashes and (missing_row_ids or pg_rows.ids):
+                postgres.Client(self.replication.schema_name).set_row_hashes(
+                    table_id=self.table.id,
+                    rows=[(row_id, hashes[row_id]) for row_id in [*missing_row_ids, *pg_rows.ids]]
+                )
 
     def sync(self) -> None:
         self.logger.info('Starting sync')
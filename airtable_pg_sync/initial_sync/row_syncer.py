@@ -1,7 +1,8 @@
 import functools
 import logging
+import typing
 
-from ..core import change_handler
+from ..core import change_handler, env, row_hasher
 from ..core.clients import postgres, airtable
 from ..core.types import changes, concepts, env_types
 
@@ -11,82 +12,113 @@ class RowSyncer:
     def __init__(self, replication: env_types.Replication, table: concepts.Table):
         self.replication = replication
         self.table = table
+        self.stale_hash_row_ids: list[concepts.RowId] = []
 
     @functools.cached_property
     def logger(self) -> logging.Logger:
         return logging.getLogger(f'Row Syncer: {self.table.id}')
 
     @functools.cached_property
-    def pg_rows(self) -> dict[concepts.RowId, concepts.Row]:
-        return {row.id: row for row in postgres.Client(self.replication.schema_name).get_rows(table=self.table)}
+    def airtable_rows(self) -> dict[concepts.RowId, tuple]:
+        # Value tuples aligned to the table's fields, the same layout Postgres rows are read in
+        airtable_rows = {}
 
-    @functools.cached_property
-    def airtable_rows(self) -> dict[concepts.RowId, concepts.Row]:
-        return {row.id: row for row in airtable.Client(self.replication.base_id).get_rows(table=self.table)}
-
-    def _get_destroyed_row_changes(self) -> list[changes.DestroyedRow]:
-        extra_row_ids = set(self.pg_rows.keys()) - set(self.airtable_rows.keys())
-
-        if extra_row_ids:
-            self.logger.info(f'Found {len(extra_row_ids)} rows that need to be destroyed')
+        for batch in airtable.Client(self.replication.base_id).get_row_batches(table=self.table):
+            airtable_rows.update(batch)
 
-        return [changes.DestroyedRow(table_id=self.table.id, row_id=row_id) for row_id in extra_row_ids]
+        return airtable_rows
 
-    def _get_new_row_changes(self) -> list[changes.NewRow]:
-        missing_row_ids = set(self.airtable_rows.keys()) - set(self.pg_rows.keys())
-
-        if missing_row_ids:
-            self.logger.info(f'Found {len(missing_row_ids)} rows that need to be created')
-
-        return [
-            changes.NewRow(table_id=self.table.id, row=self.airtable_rows[row_id])
-            for row_id in missing_row_ids
+    @functools.cached_property
+    def airtable_hashes(self) -> dict[concepts.RowId, bytes]:
+        hasher = row_hasher.RowHasher(self.table.fields)
+
+        return {row_id: hasher.hash(values) for row_id, values in self.airtable_rows.items()}
+
+    def _stream_pg_rows(self) -> typing.Generator[tuple[list[concepts.RowId], concepts.RowBatch], None, None]:
+        # Yields the ids of all Postgres rows, together with the full rows that need to be compared
+        client = postgres.Client(self.replication.schema_name)
+
+        if not env.value.row_hashes:
+
+            for batch in client.stream_rows(table=self.table):
+                yield batch.ids, batch
+
+            return
+
+        # Only ids and hashes are read, rows are fetched in full when their hash does not match Airtable's
+        for chunk in client.get_row_hash_chunks(table=self.table):
+            candidates = [(row_id, row_hash) for row_id, row_hash in chunk if row_id in self.airtable_rows]
+            changed_row_ids = [candidates[index][0] for index in row_hasher.RowHasher.changed_indices(
+                [row_hash for _, row_hash in candidates],
+                [self.airtable_hashes[row_id] for row_id, _ in candidates]
+            )]
+            self.stale_hash_row_ids.extend(changed_row_ids)
+
+            yield [row_id for row_id, _ in chunk], client.get_rows(
+                table=self.table,
+                id_filter=changed_row_ids
+            ) if changed_row_ids else concepts.RowBatch(fields=self.table.fields, ids=[], values=[])
+
+    def _store_hashes(self) -> None:
+        client = postgres.Client(self.replication.schema_name)
+        chunk_size = env.value.row_id_chunk_size
+
+        for start in range(0, len(self.stale_hash_row_ids), chunk_size):
+            client.set_row_hashes(
+                table_id=self.table.id,
+                rows=[
+                    (row_id, self.airtable_hashes[row_id])
+                    for row_id in self.stale_hash_row_ids[start:start + chunk_size]
+                ]
+            )
+
+    def _get_changes(self) -> list[changes.Change]:
+        destroyed_rows: list[changes.DestroyedRow] = []
+        cell_changes: list[changes.CellChange] = []
+        pg_row_ids: set[concepts.RowId] = set()
+
+        # Postgres rows are streamed, so only the Airtable side of the table is held in memory
+        for row_ids, pg_rows in self._stream_pg_rows():
+            pg_row_ids.update(row_ids)
+
+            for row_id in row_ids:
+
+                if row_id not in self.airtable_rows:
+                    destroyed_rows.append(changes.DestroyedRow(table_id=self.table.id, row_id=row_id))
+
+            for row_id, pg_values in pg_rows:
+
+                if row_id in self.airtable_rows:
+                    cell_changes.extend(changes.CellChange.from_row_diff(
+                        self.table,
+                        row_id,
+                        pg_values,
+                        self.airtable_rows[row_id]
+                    ))
+
+        new_rows = [
+            changes.NewRow(table_id=self.table.id, row=concepts.Row.from_values(row_id, self.table.fields, values))
+            for row_id, values in self.airtable_rows.items() if row_id not in pg_row_ids
         ]
 
-    def _update_changed_values(self) -> list[changes.CellChange]:
-        cell_changes = []
+        if env.value.row_hashes:
+            self.stale_hash_row_ids.extend(new_row.row.id for new_row in new_rows)
 
-        for row_id, airtable_row in self.airtable_rows.items():
+        if destroyed_rows:
+            self.logger.info(f'Found {len(destroyed_rows)} rows that need to be destroyed')
 
-            if row_id in self.pg_rows:
+        if new_rows:
+            self.logger.info(f'Found {len(new_rows)} rows that need to be created')
 
-                pg_row = self.pg_rows[row_id]
-                pg_field_values = {field_value.field.id: field_value for field_value in pg_row.field_values}
-                airtable_field_values = {field_value.field.id: field_value for field_value in
-                                         airtable_row.field_values}
-
-                for field_id in pg_field_values:
-
-                    # Case when null in airtable
-                    if field_id not in airtable_field_values:
-
-                        if pg_field_values[field_id].value is not None:
-                            cell_changes.append(changes.CellChange(
-                                table_id=self.table.id,
-                                row_id=pg_row.id,
-                                field_id=field_id,
-                                value=None
-                            ))
-
-                    elif pg_field_values[field_id].value != airtable_field_values[field_id].value:
-                        cell_changes.append(changes.CellChange(
-                            table_id=self.table.id,
-                            row_id=pg_row.id,
-                            field_id=field_id,
-                            value=airtable_field_values[field_id].value
-                        ))
         if cell_changes:
             self.logger.info(f'Found {len(cell_changes)} cells that need to be updated')
 
-        return cell_changes
+        return [*destroyed_rows, *new_rows, *cell_changes]
 
     def sync(self):
         self.logger.info('Syncing table rows')
-        handler = change_handler.Handler(self.replication)
-
-        for change in [
-            *self._get_destroyed_row_changes(),
-            *self._get_new_row_changes(),
-            *self._update_changed_values()
-        ]:
-            handler.handle_change(change)
+        change_handler.Handler(self.replication).handle_changes(self._get_changes())
+
+        # Applying the changes cleared the hashes of the rows involved, they now match Airtable again
+        if env.value.row_hashes:
+            self._store_hashes()
@@ -1,9 +1,10 @@
+import concurrent.futures
 import functools
 import logging
 
 from . import table_syncer
-from ..core import change_handler
-from ..core.clients import postgres, airtable
+from ..core import change_handler, env, schema_cache
+from ..core.clients import postgres
 from ..core.types import changes, concepts, env_types
 
 
@@ -16,22 +17,26 @@ class SchemaSyncer:
     def logger(self) -> logging.Logger:
         return logging.getLogger('Schema Syncer')
 
+    @functools.cached_property
+    def schema_cache(self) -> schema_cache.SchemaCache:
+        return schema_cache.SchemaCache.for_replication(self.replication)
+
     @functools.cached_property
     def _get_airtable_schema(self) -> dict[concepts.TableId, concepts.Table]:
         self.logger.debug('Getting schema from Airtable')
 
-        return {table.id: table for table in airtable.Client(self.replication.base_id).get_schema()}
+        return self.schema_cache.airtable_tables()
 
     @functools.cached_property
     def _get_pg_schema(self) -> dict[concepts.TableId, concepts.Table]:
         self.logger.debug('Getting schema from Postgres')
 
-        return {table.id: table for table in postgres.Client(self.replication.schema_name).get_schema()}
+        return self.schema_cache.pg_tables()
 
     def _make_sure_schema_exists(self) -> None:
         self.logger.info('Making sure schema exists')
         postgres.Client(self.replication.schema_name).create_schema_is_not_exists()
-        postgres.Client(self.replication.schema_name).create_table_names_table_if_not_exists()
+        postgres.Client(self.replication.schema_name).create_bookkeeping_tables_if_not_exist()
 
     def _get_destroyed_table_changes(self) -> list[changes.DestroyedTable]:
         extra_table_ids = set(self._get_pg_schema.keys()) - set(self._get_airtable_schema.keys())
@@ -49,21 +54,54 @@ class SchemaSyncer:
 
         return [changes.NewTable(table=self._get_airtable_schema[table_id]) for table_id in missing_table_ids]
 
+    def _sync_table(self, table: concepts.Table) -> None:
+        table_syncer.TableSyncer(
+            replication=self.replication,
+            airtable_table=table,
+            pg_table=self._get_pg_schema[table.id]
+        ).sync()
+
     def _sync_tables(self) -> None:
         self.__dict__.pop('_get_pg_schema', None)
-        for table in self._get_airtable_schema.values():
-            table_syncer.TableSyncer(
-                replication=self.replication,
-                airtable_table=table,
-                pg_table=self._get_pg_schema[table.id]
-            ).sync()
+        concurrency = env.value.table_sync_concurrency
+
+        if concurrency <= 1:
+
+            for table in self._get_airtable_schema.values():
+                self._sync_table(table)
+
+            return
+
+        # Largest tables start first so the slowest one is not left running on its own at the end
+        table_sizes = postgres.Client(self.replication.schema_name).get_table_sizes()
+        tables = sorted(self._get_airtable_schema.values(), key=lambda table: table_sizes.get(table.id, 0), reverse=True)
+        self.logger.info(f'Syncing {len(tables)} tables, {concurrency} at a time')
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='table_sync') as executor:
+            futures = [executor.submit(self._sync_table, table) for table in tables]
+
+            try:
+
+                for future in concurrent.futures.as_completed(futures):
+                    future.result()
+
+            except Exception as e:
+
+                for future in futures:
+                    future.cancel()
+
+                raise e
 
     def sync(self) -> None:
         self.logger.info(f'Syncing schema - {self.replication.base_id} -> {self.replication.schema_name}')
         self._make_sure_schema_exists()
+        # An initial sync always starts from freshly fetched schemas; handlers keep the cache current afterwards
+        self.schema_cache.invalidate()
         handler = change_handler.Handler(self.replication)
 
-        for change in [*self._get_new_table_changes(), *self._get_destroyed_table_changes()]:
-            handler.handle_change(change)
+        with handler.deferred_view_syncs():
+
+            for change in [*self._get_new_table_changes(), *self._get_destroyed_table_changes()]:
+                handler.handle_change(change)
 
         self._sync_tables()
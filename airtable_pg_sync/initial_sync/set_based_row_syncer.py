@@ -0,0 +1,28 @@
+import functools
+import logging
+
+from ..core import env
+from ..core.clients import airtable, postgres
+from ..core.types import concepts, env_types
+
+
+class RowSyncer:
+
+    def __init__(self, replication: env_types.Replication, table: concepts.Table):
+        self.replication = replication
+        self.table = table
+
+    @functools.cached_property
+    def logger(self) -> logging.Logger:
+        return logging.getLogger(f'Row Syncer: {self.table.id}')
+
+    def sync(self) -> None:
+        self.logger.info('Reconciling table rows through a staging table')
+        deleted, inserted, updated = postgres.Client(self.replication.schema_name).reconcile_rows(
+            table=self.table,
+            batches=airtable.Client(self.replication.base_id).get_row_batches(
+                table=self.table,
+                prefetch_depth=env.value.prefetch_depth
+            )
+        )
+        self.logger.info(f'Destroyed {deleted} rows, created {inserted} rows and updated {updated} rows')
@@ -1,11 +1,24 @@
+import datetime
 import functools
 import logging
 
-from . import reduced_memory_usage_row_syncer, row_syncer
+import requests
+
+from . import (
+    bulk_loader,
+    incremental_row_syncer,
+    merge_join_row_syncer,
+    reduced_memory_usage_row_syncer,
+    row_syncer,
+    set_based_row_syncer
+)
 from ..core import change_handler
 from ..core import env
+from ..core.clients import postgres
 from ..core.types import changes, concepts, env_types
 
+WATERMARK_OVERLAP = datetime.timedelta(minutes=1)
+
 
 class TableSyncer:
 
@@ -56,23 +69,95 @@ class TableSyncer:
 
         return changed_fields
 
+    def _resume_bulk_load(self, offset: concepts.PageOffset) -> bool:
+
+        try:
+            bulk_loader.BulkLoader(replication=self.replication, table=self.airtable_table, offset=offset).sync()
+
+            return True
+
+        except requests.HTTPError as e:
+
+            # Airtable only keeps page offsets around for a limited time
+            if e.response is None or e.response.status_code != 422:
+                raise e
+
+            self.logger.warning(f'Page offset {offset} has expired - syncing the whole table instead')
+            postgres.Client(self.replication.schema_name).save_sync_checkpoint(self.airtable_table.id, 'schema')
+
+            return False
+
     def _sync_rows(self):
-        if env.value.reduced_memory:
+        checkpoint = postgres.Client(self.replication.schema_name).get_sync_checkpoint(self.airtable_table.id)
+
+        if checkpoint and concepts.SYNC_STAGES.index(checkpoint[0]) >= concepts.SYNC_STAGES.index('rows'):
+            self.logger.info('Rows were already synced before the last interruption')
+
+            return
+
+        # Overlaps the previous sync a little so that clock skew with Airtable cannot lose modifications
+        started_at = datetime.datetime.now(datetime.timezone.utc) - WATERMARK_OVERLAP
+        watermark = None
+        resumed = False
+
+        if env.value.incremental_sync:
+            watermark = postgres.Client(self.replication.schema_name).get_sync_watermark(self.airtable_table.id)
+
+        if checkpoint and checkpoint[1]:
+            resumed = self._resume_bulk_load(checkpoint[1])
+
+        if resumed:
+            pass
+
+        elif postgres.Client(self.replication.schema_name).is_table_empty(table_id=self.airtable_table.id):
+            bulk_loader.BulkLoader(replication=self.replication, table=self.airtable_table).sync()
+
+        elif watermark:
+            self.logger.info('Using incremental row syncer')
+            incremental_row_syncer.RowSyncer(
+                replication=self.replication,
+                table=self.airtable_table,
+                modified_after=watermark
+            ).sync()
+
+        elif env.value.set_based_reconciliation:
+            self.logger.info('Using set based row syncer')
+            set_based_row_syncer.RowSyncer(replication=self.replication, table=self.airtable_table).sync()
+
+        elif env.value.merge_join_reconciliation:
+            self.logger.info('Using merge join row syncer')
+            merge_join_row_syncer.RowSyncer(replication=self.replication, table=self.airtable_table).sync()
+
+        elif env.value.reduced_memory:
             self.logger.info('Using reduced memory row syncer')
             reduced_memory_usage_row_syncer.RowSyncer(replication=self.replication, table=self.airtable_table).sync()
 
         else:
             row_syncer.RowSyncer(replication=self.replication, table=self.airtable_table).sync()
 
+        # Rows loaded before an interruption may have been modified since, so a resumed load sets no watermark
+        if env.value.incremental_sync and not resumed:
+            postgres.Client(self.replication.schema_name).set_sync_watermark(self.airtable_table.id, started_at)
+
+        postgres.Client(self.replication.schema_name).save_sync_checkpoint(self.airtable_table.id, 'rows')
+
     def sync(self):
         self.logger.info(f'Syncing table - {self.airtable_table.name} ({self.airtable_table.id})')
         handler = change_handler.Handler(self.replication)
 
-        for change in [
-            *self._get_new_field_changes(),
-            *self._get_destroyed_field_changes(),
-            *self._get_field_type_changes()
-        ]:
-            handler.handle_change(change)
+        with handler.deferred_view_syncs():
+
+            for change in [
+                *self._get_new_field_changes(),
+                *self._get_destroyed_field_changes(),
+                *self._get_field_type_changes()
+            ]:
+                handler.handle_change(change)
+
+        postgres.Client(self.replication.schema_name).set_up_row_hash_column(self.airtable_table.id)
+
+        # Schema changes clear the checkpoint, anything left over is progress on the current schema
+        if not postgres.Client(self.replication.schema_name).get_sync_checkpoint(self.airtable_table.id):
+            postgres.Client(self.replication.schema_name).save_sync_checkpoint(self.airtable_table.id, 'schema')
 
         self._sync_rows()
@@ -2,6 +2,7 @@ import functools
 import logging
 
 from . import individual_view_syncer
+from ..core import schema_cache
 from ..core.clients import postgres
 from ..core.types import concepts, env_types
 
@@ -19,8 +20,19 @@ class ViewSyncer:
     def pg_schema(self) -> list[concepts.Table]:
         self.logger.debug('Getting schema from Postgres')
 
-        return postgres.Client(self.replication.schema_name).get_schema()
+        return list(schema_cache.SchemaCache.for_replication(self.replication).pg_tables().values())
 
     def sync(self) -> None:
+        client = postgres.Client(self.replication.schema_name)
+
         for table in self.pg_schema:
+            checkpoint = client.get_sync_checkpoint(table.id)
+
+            if checkpoint and checkpoint[0] == 'view':
+                self.logger.debug(f'View of {table.id} was already synced before the last interruption')
+                continue
+
             individual_view_syncer.IndividualViewSyncer(self.replication, table).sync()
+
+            if checkpoint:
+                client.save_sync_checkpoint(table.id, 'view')
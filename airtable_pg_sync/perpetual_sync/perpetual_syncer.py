@@ -1,20 +1,95 @@
 import functools
 import logging
+import time
 
-from ..core import change_handler
-from ..core.types import bridges
+from ..core import change_handler, env, schema_cache
+from ..core.clients import postgres
+from ..core.types import bridges, changes, env_types
 
 
 class PerpetualSyncer:
 
     def __init__(self, queue: bridges.Queue):
         self.queue = queue
+        self.last_batch_latency: float | None = None
+        self.handlers: dict[env_types.Replication, change_handler.Handler] = {}
+        self.view_syncs_due: dict[env_types.Replication, float] = {}
 
     @functools.cached_property
     def logger(self) -> logging.Logger:
         return logging.getLogger('Perpetual Syncer')
 
+    @property
+    def coalesced_view_syncs(self) -> int:
+        return sum(handler.coalesced_view_syncs for handler in self.handlers.values())
+
+    def _get_handler(self, replication: env_types.Replication) -> change_handler.Handler:
+
+        # Handlers outlive a batch so that view rebuilds can be deferred across batches
+        if replication not in self.handlers:
+            self.handlers[replication] = change_handler.Handler(replication=replication)
+            self.handlers[replication].defer_view_syncs()
+
+        return self.handlers[replication]
+
+    def apply_batch(self, change_context: changes.ChangeContext, received_changes: list[changes.Change]) -> None:
+        start = time.monotonic()
+        handler = self._get_handler(change_context.replication)
+        view_sync_requests = handler.view_sync_requests
+
+        # One transaction per payload fetch so readers never see a half-applied batch
+        try:
+            with postgres.Client.transaction():
+                handler.handle_changes(received_changes)
+
+                if change_context.cursor is not None:
+                    postgres.Client(change_context.replication.schema_name).save_webhook_cursor(
+                        base_id=change_context.replication.base_id,
+                        cursor=change_context.cursor
+                    )
+
+                if not env.value.view_sync_debounce_seconds:
+                    handler.sync_deferred_views()
+
+        except Exception as e:
+            # The cache may already reflect schema changes that were just rolled back
+            schema_cache.SchemaCache.for_replication(change_context.replication).invalidate()
+            raise e
+
+        # Only batches with schema changes push the rebuild back, row traffic leaves the pending rebuild where it is
+        if handler.deferred_view_table_ids and handler.view_sync_requests != view_sync_requests:
+            self.view_syncs_due[change_context.replication] = start + env.value.view_sync_debounce_seconds
+
+        self.last_batch_latency = time.monotonic() - start
+        self.logger.info(
+            f'Applied batch of {len(received_changes)} changes to {change_context.replication.schema_name} '
+            f'in {self.last_batch_latency * 1000:.0f}ms'
+        )
+
+    def sync_due_views(self) -> None:
+
+        for replication, due in list(self.view_syncs_due.items()):
+
+            if time.monotonic() < due:
+                continue
+
+            with postgres.Client.transaction():
+                self.handlers[replication].sync_deferred_views()
+
+            del self.view_syncs_due[replication]
+
     def start(self):
 
-        for change_context, change in self.queue:
-            change_handler.Handler(replication=change_context.replication).handle_change(change)
+        while True:
+
+            # Due rebuilds also run between batches, so steady traffic cannot hold them back
+            if self.view_syncs_due:
+                self.sync_due_views()
+
+            # Only poll while views are waiting to be rebuilt, otherwise block on the queue as usual
+            if self.view_syncs_due and self.queue.empty:
+                time.sleep(0.25)
+                continue
+
+            change_context, received_changes = next(self.queue)
+            self.apply_batch(change_context, received_changes)
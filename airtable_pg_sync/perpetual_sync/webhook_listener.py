@@ -1,5 +1,6 @@
 import _thread
 import asyncio
+import datetime
 import functools
 import json
 import logging
@@ -10,9 +11,12 @@ import time
 from aiohttp import web
 
 from ..core import env
-from ..core.clients import airtable
+from ..core.clients import airtable, postgres
 from ..core.types import bridges, env_types, concepts
 
+# Airtable keeps webhook payloads for 7 days, after which a stored cursor can no longer be resumed from
+PAYLOAD_RETENTION = datetime.timedelta(days=7)
+
 
 class WebhookListener:
     __session = None
@@ -20,6 +24,7 @@ class WebhookListener:
     def __init__(self, queue: bridges.Queue):
         self.env = env.value
         self.queue = queue
+        self.resumed_replications: set[env_types.Replication] = set()
 
     @functools.cached_property
     def logger(self) -> logging.Logger:
@@ -37,28 +42,89 @@ class WebhookListener:
 
         return web.Response(text="I'm alive!")
 
-    def remove_webhooks(self):
+    def remove_webhooks(self, keep: set[concepts.WebhookId] = frozenset()):
         self.logger.info('Removing webhooks')
 
         for replication in self.env.replications:
 
             for id, url in airtable.Client(replication.base_id).list_webhooks():
 
-                if url.startswith(self.env.webhook_url):
+                if url.startswith(self.env.webhook_url) and id not in keep:
                     self.logger.info(f'Removing webhook for {replication.endpoint}')
                     airtable.Client(replication.base_id).delete_webhook(id)
 
+    def _get_resumable_webhook(
+            self,
+            replication: env_types.Replication
+    ) -> tuple[concepts.WebhookId, concepts.WebhookCursor | None] | None:
+        client = postgres.Client(replication.schema_name)
+        client.create_schema_is_not_exists()
+        client.create_bookkeeping_tables_if_not_exist()
+        state = client.get_webhook_state(replication.base_id)
+
+        if not state:
+            return None
+
+        webhook_id, cursor, updated_at = state
+
+        if datetime.datetime.now(datetime.timezone.utc) - updated_at > PAYLOAD_RETENTION:
+            self.logger.info(f'Stored cursor for {replication.endpoint} is older than the payload retention')
+
+            return None
+
+        if (webhook_id, f'{self.env.webhook_url}{replication.endpoint}') not in \
+                airtable.Client(replication.base_id).list_webhooks():
+            self.logger.info(f'Stored webhook for {replication.endpoint} no longer exists')
+
+            return None
+
+        # A cursor is only stored once the replication has been fully synced, until then all payloads are replayed
+        self.queue.cursors[replication] = cursor or 1
+
+        return webhook_id, cursor
+
     @functools.cache
     def set_up_webhooks(self) -> list[tuple[env_types.Replication, concepts.WebhookId]]:
         self.logger.info('Setting up webhooks')
+        resumable = {}
+        interrupted = set()
+
+        for replication in self.env.replications:
+            webhook = self._get_resumable_webhook(replication)
+
+            if webhook:
+                resumable[replication] = webhook[0]
+
+                if webhook[1] is None:
+                    # The initial sync was interrupted and carries on from its checkpoints
+                    interrupted.add(replication)
+
+        self.remove_webhooks(keep=set(resumable.values()))
         ids = []
 
         for replication in self.env.replications:
+
+            if replication in resumable:
+                self.logger.info(
+                    f'Resuming webhook for {replication.endpoint} from cursor {self.queue.cursors[replication]}'
+                )
+                ids.append((replication, resumable[replication]))
+                # Payloads that arrived while nothing was listening have to be fetched without a notification
+                self.queue.add(id=resumable[replication], replication=replication)
+                continue
+
             self.logger.info(f'Setting up webhook for {replication.endpoint}')
-            ids.append((
-                replication,
-                airtable.Client(replication.base_id).setup_webhook(replication)
-            ))
+            webhook_id = airtable.Client(replication.base_id).setup_webhook(replication)
+            postgres.Client(replication.schema_name).save_webhook_state(
+                base_id=replication.base_id,
+                webhook_id=webhook_id,
+                cursor=None
+            )
+            # Changes made before this webhook existed are not replayed, so earlier initial sync progress is stale
+            postgres.Client(replication.schema_name).clear_sync_checkpoints()
+            ids.append((replication, webhook_id))
+
+        self.resumed_replications = set(resumable) - interrupted
 
         return ids
 
@@ -96,7 +162,6 @@ class WebhookListener:
 
         try:
 
-            self.remove_webhooks()
             self.set_up_webhooks()
 
             threading.Thread(target=self.keep_webhooks_alive, args=(), daemon=True).start()
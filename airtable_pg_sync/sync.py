@@ -1,15 +1,22 @@
+import concurrent.futures
 import functools
 import logging
 import logging.config
 import threading
+import time
 
 import pkg_resources
 
 from .core import env
-from .core.types import bridges
-from .initial_sync import initial_syncer
+from .core.clients import postgres
+from .core.types import bridges, env_types
+from .initial_sync import initial_syncer, view_syncer
 from .perpetual_sync import perpetual_syncer, webhook_listener
 
+# A failed initial sync carries on from its checkpoints this many times before starting over
+INITIAL_SYNC_RETRIES = 3
+RETRY_DELAY_SECONDS = 10
+
 
 def setup_logging():
     logging.config.fileConfig(pkg_resources.resource_filename(__name__, './logging.conf'),
@@ -26,32 +33,118 @@ class Sync:
         env.load_config(config_path)
         self.perpetual = perpetual
         self.queue = bridges.Queue()
+        self.synced_replications: set[env_types.Replication] = set()
 
     @functools.cached_property
     def logger(self) -> logging.Logger:
         return logging.getLogger('Sync')
 
-    def start_tracking_changes(self):
+    def start_tracking_changes(self) -> set[env_types.Replication]:
         self.logger.info('Starting to track changes through webhook listener')
         listener = webhook_listener.WebhookListener(queue=self.queue)
+        # Webhooks are set up before the listener thread starts so that resumed replications are known up front
+        listener.set_up_webhooks()
         listener_thread = threading.Thread(target=listener.start, args=(), daemon=True)
         listener_thread.start()
 
-    def perform_initial_sync(self):
-        self.logger.info('Starting initial sync')
-        for replication in env.value.replications:
-            initial_syncer.InitialSyncer(replication).sync()
+        return listener.resumed_replications
+
+    @staticmethod
+    def _clear_sync_checkpoints(replications: list[env_types.Replication]) -> None:
+
+        for replication in replications:
+            client = postgres.Client(replication.schema_name)
+            client.create_schema_is_not_exists()
+            client.create_bookkeeping_tables_if_not_exist()
+            client.clear_sync_checkpoints()
+
+    def _sync_replication(self, replication: env_types.Replication) -> float:
+        start = time.monotonic()
+        initial_syncer.InitialSyncer(replication).sync()
+
+        return time.monotonic() - start
+
+    def perform_initial_sync(self, replications: list[env_types.Replication] | None = None):
+        replications = env.value.replications if replications is None else replications
+        concurrency = env.value.replication_sync_concurrency
+        self.logger.info(f'Starting initial sync of {len(replications)} replications, {concurrency} at a time')
+        failed: list[env_types.Replication] = []
+
+        # Each base has its own Airtable rate limit, so replications are independent of each other
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=concurrency,
+                thread_name_prefix='replication_sync'
+        ) as executor:
+            futures = {executor.submit(self._sync_replication, replication): replication for replication in replications}
+
+            for done, future in enumerate(concurrent.futures.as_completed(futures), start=1):
+                replication = futures[future]
+
+                try:
+                    elapsed = future.result()
+                    self.synced_replications.add(replication)
+
+                    if self.perpetual:
+                        # Payloads from before the current cursor are now reflected in Postgres
+                        postgres.Client(replication.schema_name).save_webhook_cursor(
+                            base_id=replication.base_id,
+                            cursor=self.queue.cursors.get(replication, 1)
+                        )
+
+                    self.logger.info(
+                        f'Initial sync {replication.base_id} -> {replication.schema_name} took {elapsed:.1f}s '
+                        f'({done}/{len(replications)} replications done)'
+                    )
+
+                except Exception as e:
+                    # A failing base should not stop the others from being synced
+                    self.logger.exception(
+                        f'Initial sync {replication.base_id} -> {replication.schema_name} failed '
+                        f'({done}/{len(replications)} replications done)'
+                    )
+                    self.logger.exception(e)
+                    failed.append(replication)
+
+        if failed:
+            raise RuntimeError(
+                f'Initial sync failed for {len(failed)} replications: '
+                f'{", ".join(f"{replication.base_id} -> {replication.schema_name}" for replication in failed)}'
+            )
+
         self.logger.info('Finished initial sync')
 
     def run(self):
+        resumed_replications = set()
+        initial_sync_done = False
+        failed_attempts = 0
+
+        # Resumed replications skip the table syncs that would otherwise bring the row hash columns in line
+        for replication in env.value.replications:
+            postgres.Client(replication.schema_name).set_up_row_hash_columns()
 
         if self.perpetual:
-            self.start_tracking_changes()
+            resumed_replications = self.start_tracking_changes()
+
+        else:
+            # Nothing replays the changes made since an earlier run, so its checkpoints cannot be built upon
+            self._clear_sync_checkpoints(env.value.replications)
 
         while True:
 
             try:
-                self.perform_initial_sync()
+
+                for replication in resumed_replications:
+                    self.logger.info(f'Resuming {replication.base_id} -> {replication.schema_name} from stored cursor')
+                    # Views may have been waiting on a debounced rebuild when the previous run stopped
+                    view_syncer.ViewSyncer(replication).sync()
+
+                self.perform_initial_sync([
+                    replication for replication in env.value.replications
+                    if replication not in resumed_replications | self.synced_replications
+                ])
+                initial_sync_done = True
+                failed_attempts = 0
+                resumed_replications = set()
 
                 if not self.perpetual:
                     break
@@ -61,7 +154,26 @@ class Sync:
             except Exception as e:
                 self.logger.exception('Error while syncing changes')
                 self.logger.exception(e)
+                failed_attempts += 1
+                delay = RETRY_DELAY_SECONDS * failed_attempts
+                self.logger.info(f'Retrying in {delay}s')
+                time.sleep(delay)
+
+                if not initial_sync_done and failed_attempts <= INITIAL_SYNC_RETRIES:
+                    # Queued payloads are still needed on top of tables that were checkpointed as synced
+                    self.logger.info(f'Resuming initial sync from checkpoints (attempt {failed_attempts})')
+                    continue
+
+                if not initial_sync_done:
+                    # The failure may come from the state the checkpoints resume into
+                    self.logger.info(f'Initial sync failed {failed_attempts} times, starting over without checkpoints')
 
+                failed_attempts = 0
                 self.logger.info('Clearing queue')
                 self.queue.clear()
+                self._clear_sync_checkpoints(env.value.replications)
+                # Clearing the queue skips payloads, so resumed replications need a full sync as well
+                resumed_replications = set()
+                self.synced_replications = set()
+                initial_sync_done = False
                 self.logger.info('Re-syncing all tables')
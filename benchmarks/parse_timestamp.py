@@ -0,0 +1,46 @@
+# Run from the repository root with: python -m benchmarks.parse_timestamp
+import argparse
+import datetime
+import timeit
+
+from dateutil import parser
+
+from airtable_pg_sync.core.types import concepts
+
+SAMPLES = [
+    '2024-01-02T03:04:05.000Z',
+    '2024-01-02T03:04:05Z',
+    '2024-01-02T03:04:05.123456+02:00',
+    '2024-01-02',
+    '2024-01-02 03:04:05',
+    'January 2 2024 3:04pm',
+    datetime.datetime(2024, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc),
+]
+
+
+def parse_timestamp_with_dateutil(timestamp) -> str | None:
+    # parse_timestamp as it was before the fromisoformat fast path
+    if not timestamp:
+        return None
+
+    return parser.parse(str(timestamp)).replace(tzinfo=None).isoformat(timespec='seconds')
+
+
+def main():
+    argument_parser = argparse.ArgumentParser(description='Compare parse_timestamp against plain dateutil parsing')
+    argument_parser.add_argument('--number', type=int, default=100_000)
+    argument_parser.add_argument('--timestamp', default='2024-01-02T03:04:05.000Z')
+    args = argument_parser.parse_args()
+
+    for sample in SAMPLES:
+
+        if concepts.parse_timestamp(sample) != parse_timestamp_with_dateutil(sample):
+            raise AssertionError(f'Outputs differ for {sample!r}')
+
+    for name, function in (('dateutil', parse_timestamp_with_dateutil), ('parse_timestamp', concepts.parse_timestamp)):
+        seconds = timeit.timeit(lambda: function(args.timestamp), number=args.number)
+        print(f'{name:>16}: {seconds / args.number * 1e6:.1f}us per call')
+
+
+if __name__ == '__main__':
+    main()